@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Time the initial load of a BGP table in to BGPWorker and report the
+    peak memory use, next to the old read-all, split and build-a-list way
+    of loading. Every variant runs in its own process so the peak resident
+    set sizes can be compared.
+
+    Usage:
+        python benchmarks/bench_bgp_load.py [table.txt]
+
+    Without a table file a synthetic table of 600k prefixes is generated.
+"""
+
+import os
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, '.')
+
+from irrexplorer import bgp
+
+SYNTHETIC_PREFIXES = 600000
+
+
+def synthetic_table(path, n_prefixes=SYNTHETIC_PREFIXES):
+    with open(path, 'w') as f:
+        for i in range(n_prefixes):
+            f.write("%i.%i.%i.0/24 %i\n" % (i >> 16 & 255 or 1, i >> 8 & 255,
+                                           i & 255, i % 60000 + 1))
+
+
+def load_old(path):
+    """ what BGPClient.get and BGPWorker.updateTree used to do """
+    prefixes = []
+    for line in open(path).read().split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        prefix, origin = line.split(' ')
+        prefixes.append((prefix, int(origin)))
+    worker = bgp.BGPWorker(None, None, bgp_source=path)
+    worker.apply_table(dict(prefixes).items())
+    return worker
+
+
+def load_streamed(path):
+    worker = bgp.BGPWorker(None, None, bgp_source=path)
+    worker.updateTree()
+    return worker
+
+
+def measure(name, load, path, results):
+    t_start = time.time()
+    worker = load(path)
+    t_delta = time.time() - t_start
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((name, len(worker.prefixes), t_delta, maxrss))
+
+
+def main():
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        synthetic_table(path)
+
+    results = multiprocessing.Queue()
+    try:
+        for name, load in [('old', load_old), ('streamed', load_streamed)]:
+            p = multiprocessing.Process(target=measure,
+                                        args=(name, load, path, results))
+            p.start()
+            name, n_prefixes, t_delta, maxrss = results.get()
+            p.join()
+            print "%-9s %i prefixes in %.2f seconds, peak RSS %i MB" % \
+                (name, n_prefixes, t_delta, maxrss / 1024)
+    finally:
+        if len(sys.argv) == 1:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
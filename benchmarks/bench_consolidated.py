@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Compare a radix tree per IRR database with one MultiIRRDatabase tree
+
+    Both are filled with the same synthetic route objects, most prefixes
+    are registered in several databases. Reports the peak RSS of a process
+    holding the data and the time of search_specifics over all databases.
+
+    Usage:
+        python benchmarks/bench_consolidated.py [routes per database]
+"""
+
+import sys
+import time
+import random
+import resource
+import multiprocessing
+
+sys.path.insert(0, '.')
+
+from irrexplorer import irrdb
+
+DATABASES = ['afrinic', 'altdb', 'apnic', 'arin', 'bboi', 'bell', 'gt',
+             'jpirr', 'level3', 'nttcom', 'radb', 'rgnet', 'savvis', 'tc',
+             'ripe']
+QUERIES = 1000
+
+
+def routes(size):
+    rnd = random.Random(42)
+    shared = ["%i.%i.%i.0/24" % (rnd.randint(1, 223), rnd.randint(0, 255),
+                                 rnd.randint(0, 255)) for _ in range(size)]
+    for name in DATABASES:
+        for prefix in rnd.sample(shared, size / 2):
+            yield name, prefix, rnd.randint(1, 65000)
+
+
+def targets():
+    rnd = random.Random(7)
+    return ["%i.%i.0.0/16" % (rnd.randint(1, 223), rnd.randint(0, 255))
+            for _ in range(QUERIES)]
+
+
+def separate(size, results):
+    dbs = dict((name, irrdb.IRRDatabase()) for name in DATABASES)
+    for name, prefix, origin in routes(size):
+        dbs[name].add_route(prefix, origin)
+    t_start = time.time()
+    for target in targets():
+        for db in dbs.values():
+            db.tree.search_covered(target)
+    results.put(('separate', time.time() - t_start,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 sum(len(db.tree.nodes()) for db in dbs.values())))
+
+
+def consolidated(size, results):
+    multi = irrdb.MultiIRRDatabase(DATABASES)
+    views = dict((name, multi.database(name)) for name in DATABASES)
+    for name, prefix, origin in routes(size):
+        views[name].add_route(prefix, origin)
+    t_start = time.time()
+    for target in targets():
+        multi.search_specifics(target)
+    results.put(('consolidated', time.time() - t_start,
+                 resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 len(multi.tree.nodes())))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    results = multiprocessing.Queue()
+    for func in [separate, consolidated]:
+        p = multiprocessing.Process(target=func, args=(size, results))
+        p.start()
+        name, t_query, rss, nodes = results.get()
+        p.join()
+        print "%-12s %8i nodes %6i MB peak RSS %6.3f ms per query" % (
+            name, nodes, rss / 1024, t_query / QUERIES * 1e3)
+
+
+if __name__ == '__main__':
+    main()
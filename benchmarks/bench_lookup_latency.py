@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Lookup latency in an NRTM worker during an update storm
+
+    A writer thread adds and deletes route objects as fast as it can, the
+    way NRTMFollower applies them, while a lookup thread runs
+    search_specifics lookups the way LookupWorker does. Run once without
+    a lock (the old behaviour) and once with rwlock.ReadWriteLock. Reports
+    latency percentiles, the number of lookups that caught an update half
+    way (a node without origins) and the update rate.
+
+    Usage:
+        python benchmarks/bench_lookup_latency.py [routes] [seconds]
+"""
+
+import sys
+import time
+import random
+import threading
+
+sys.path.insert(0, '.')
+
+from irrexplorer import irrdb, rwlock
+
+
+class NoLock(object):
+
+    def reading(self):
+        return self
+
+    writing = reading
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def prefix(rnd):
+    return "10.%i.%i.0/24" % (rnd.randint(0, 255), rnd.randint(0, 255))
+
+
+def storm(db, lock, stop, counter):
+    rnd = random.Random(1)
+    while not stop.is_set():
+        p, origin = prefix(rnd), rnd.randint(1, 1000)
+        with lock.writing():
+            db.add_route(p, origin)
+        with lock.writing():
+            db.delete_route(p, origin)
+        counter[0] += 2
+
+
+def lookups(db, lock, stop, latencies, errors):
+    rnd = random.Random(2)
+    while not stop.is_set():
+        target = "10.%i.0.0/16" % rnd.randint(0, 255)
+        t_start = time.time()
+        with lock.reading():
+            results = {}
+            for rnode in db.tree.search_covered(target):
+                try:
+                    results[rnode.prefix] = {'origins': rnode.data['origins']}
+                except KeyError:
+                    errors[0] += 1
+        latencies.append(time.time() - t_start)
+        time.sleep(0.001)
+
+
+def run(name, lock, routes, seconds):
+    db = irrdb.IRRDatabase()
+    rnd = random.Random(0)
+    for _ in range(routes):
+        db.add_route(prefix(rnd), rnd.randint(1, 1000))
+
+    stop = threading.Event()
+    latencies, errors, updates = [], [0], [0]
+    threads = [threading.Thread(target=storm, args=(db, lock, stop, updates)),
+               threading.Thread(target=lookups,
+                                args=(db, lock, stop, latencies, errors))]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1,
+                                  int(len(latencies) * p))] * 1e3
+    print "%-8s %6i lookups  p50 %6.2f  p99 %6.2f  p99.9 %6.2f  max %6.2f ms" \
+        "  %4i half updates seen  %7i updates/s" % (
+            name, len(latencies), pct(0.5), pct(0.99), pct(0.999),
+            latencies[-1] * 1e3, errors[0], updates[0] / seconds)
+
+
+def main():
+    routes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    run('no lock', NoLock(), routes, seconds)
+    run('rwlock', rwlock.ReadWriteLock(), routes, seconds)
+
+
+if __name__ == '__main__':
+    main()
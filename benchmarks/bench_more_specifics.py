@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Compare the ways of finding the more specifics of a prefix in a list
+
+        ipaddr: the old find_more_specifics, an IPNetwork per prefix per query
+        ranges: PrefixRanges built once, a sorted range search per query
+
+    Usage:
+        python benchmarks/bench_more_specifics.py [list size] [queries]
+"""
+
+import sys
+import time
+import random
+
+import ipaddr
+
+sys.path.insert(0, '.')
+
+from irrexplorer import utils
+
+
+def ipaddr_more_specifics(target, prefixes):
+    result = []
+    for prefix in prefixes:
+        if prefix:
+            if ipaddr.IPNetwork(prefix) in ipaddr.IPNetwork(target):
+                result.append(prefix)
+    return result
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rnd = random.Random(42)
+
+    prefixes = []
+    for _ in range(size):
+        if rnd.random() < 0.8:
+            prefixes.append("%i.%i.%i.0/%i" % (
+                rnd.randint(1, 223), rnd.randint(0, 255),
+                rnd.randint(0, 255), 24))
+        else:
+            prefixes.append("2001:db8:%x::/48" % rnd.randint(0, 0xffff))
+    targets = ["%i.0.0.0/8" % rnd.randint(1, 223) for _ in range(queries / 2)]
+    targets += ["2001:db8:%x::/36" % (rnd.randint(0, 0xf) << 12)
+                for _ in range(queries - len(targets))]
+
+    t_start = time.time()
+    old = [ipaddr_more_specifics(target, prefixes) for target in targets]
+    t_old = time.time() - t_start
+
+    t_start = time.time()
+    ranges = utils.PrefixRanges(prefixes)
+    t_build = time.time() - t_start
+    t_start = time.time()
+    new = [ranges.more_specifics(target) for target in targets]
+    t_new = time.time() - t_start
+
+    assert old == new
+    print "%i prefixes, %i queries" % (size, queries)
+    print "ipaddr: %.2f ms per query" % (t_old / queries * 1e3)
+    print "ranges: %.2f ms to build, %.3f ms per query" % (
+        t_build * 1e3, t_new / queries * 1e3)
+
+
+if __name__ == '__main__':
+    main()
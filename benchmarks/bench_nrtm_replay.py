@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Replay a synthetic NRTM stream against the inverse ASN map
+
+    A large transit ASN holds tens of thousands of route objects, the stream
+    is a mix of ADDs (including re-ADDs of existing objects) and DELs of
+    routes of that ASN. The list based map that NRTMWorker used to keep is
+    measured next to irrdb.IRRDatabase.
+
+    Usage:
+        python benchmarks/bench_nrtm_replay.py [routes] [updates]
+"""
+
+import sys
+import time
+import random
+
+sys.path.insert(0, '.')
+
+from irrexplorer import irrdb
+
+TRANSIT_ASN = 3356
+
+
+def synthetic_stream(n_routes, n_updates, seed=42):
+    rnd = random.Random(seed)
+    prefixes = ["%i.%i.%i.0/24" % (i >> 16 & 255 or 1, i >> 8 & 255, i & 255)
+                for i in range(n_routes)]
+    initial = [('ADD', prefix, TRANSIT_ASN) for prefix in prefixes]
+    registered = set(prefixes)
+    updates = []
+    for _ in range(n_updates):
+        prefix = rnd.choice(prefixes)
+        if prefix in registered and rnd.random() < 0.5:
+            updates.append(('DEL', prefix, TRANSIT_ASN))
+            registered.discard(prefix)
+        else:
+            updates.append(('ADD', prefix, TRANSIT_ASN))
+            registered.add(prefix)
+    return initial, updates
+
+
+def replay_list(initial, updates):
+    """ the inverse ASN map as NRTMWorker kept it before """
+    asn_prefix_map = {}
+    for stream in initial, updates:
+        t_start = time.time()
+        for cmd, prefix, origin in stream:
+            if cmd == 'ADD':
+                asn_prefix_map.setdefault(origin, []).append(prefix)
+            else:
+                asn_prefix_map[origin].remove(prefix)
+        t_delta = time.time() - t_start
+    return t_delta, len(asn_prefix_map[TRANSIT_ASN])
+
+
+def replay_irrdb(initial, updates):
+    db = irrdb.IRRDatabase()
+    for stream in initial, updates:
+        t_start = time.time()
+        for cmd, prefix, origin in stream:
+            if cmd == 'ADD':
+                db.add_route(prefix, origin)
+            else:
+                db.delete_route(prefix, origin)
+        t_delta = time.time() - t_start
+    return t_delta, len(db.asn_prefix_map[TRANSIT_ASN])
+
+
+def main():
+    n_routes = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    initial, updates = synthetic_stream(n_routes, n_updates)
+
+    for name, replay in [('list', replay_list), ('irrdb', replay_irrdb)]:
+        t_delta, size = replay(initial, updates)
+        print "%-6s %i updates in %.3f seconds, %.1f us/update, " \
+            "%i prefixes for AS%i" % (name, len(updates), t_delta,
+                                      t_delta / len(updates) * 1e6, size,
+                                      TRANSIT_ASN)
+
+
+if __name__ == '__main__':
+    main()
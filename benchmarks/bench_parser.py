@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Measure the throughput of parser.parse_dump()
+
+    Usage:
+        python benchmarks/bench_parser.py [-p processes] [dumpfile[.gz]]
+
+    Without a dump file a synthetic dump with a RADB-like mix of object
+    classes is generated. With -p the parallel parser is measured as well.
+"""
+
+import gzip
+import sys
+import optparse
+import time
+import random
+import cStringIO
+
+sys.path.insert(0, '.')
+
+from irrexplorer import parser
+
+SYNTHETIC_OBJECTS = 200000
+
+
+def synthetic_dump(n_objects=SYNTHETIC_OBJECTS, seed=42):
+    rnd = random.Random(seed)
+    out = cStringIO.StringIO()
+    for i in range(n_objects):
+        kind = rnd.random()
+        if kind < 0.6:
+            out.write("route:      %i.%i.%i.0/24\n" %
+                      (rnd.randint(1, 223), rnd.randint(0, 255),
+                       rnd.randint(0, 255)))
+            out.write("descr:      synthetic route object %i\n" % i)
+            out.write("origin:     AS%i\n" % rnd.randint(1, 400000))
+            out.write("mnt-by:     MAINT-AS%i\n" % i)
+            out.write("changed:    noc@example.net 20150101\n")
+            out.write("source:     RADB\n\n")
+        elif kind < 0.65:
+            out.write("as-set:     AS-SET%i\n" % i)
+            out.write("descr:      synthetic as-set\n")
+            members = ["AS%i" % rnd.randint(1, 400000)
+                       for _ in range(rnd.randint(1, 200))]
+            out.write("members:    %s\n" % ", ".join(members[:10]))
+            for j in range(10, len(members), 10):
+                out.write("            %s\n" % ", ".join(members[j:j + 10]))
+            out.write("source:     RADB\n\n")
+        else:
+            out.write("mntner:     MAINT-AS%i\n" % i)
+            out.write("descr:      synthetic maintainer\n")
+            out.write("admin-c:    NOC%i\n" % i)
+            out.write("tech-c:     NOC%i\n" % i)
+            out.write("upd-to:     noc@example.net\n")
+            out.write("auth:       CRYPT-PW HIDDENCRYPTPW\n")
+            out.write("mnt-by:     MAINT-AS%i\n" % i)
+            out.write("changed:    noc@example.net 20150101\n")
+            out.write("source:     RADB\n\n")
+    return out.getvalue()
+
+
+def measure(name, objects, data, lines):
+    t_start = time.time()
+    n_objects = 0
+    for obj in objects:
+        n_objects += 1
+    t_delta = time.time() - t_start
+
+    print "%s: parsed %i objects of interest from %.1f MB in %.2f seconds" \
+        % (name, n_objects, len(data) / 1e6, t_delta)
+    print "%s: %.1f MB/s, %i lines/s" % (name, len(data) / 1e6 / t_delta,
+                                         len(lines) / t_delta)
+
+
+def main():
+    optparser = optparse.OptionParser()
+    optparser.add_option('-p', '--processes', type='int', default=0)
+    options, args = optparser.parse_args()
+    if args:
+        path = args[0]
+        f = gzip.open(path) if path.endswith('.gz') else open(path)
+        data = f.read()
+    else:
+        data = synthetic_dump()
+
+    lines = data.splitlines(True)
+    measure('serial', parser.parse_dump(lines), data, lines)
+    if options.processes:
+        measure('parallel (%i)' % options.processes,
+                parser.parse_dump_parallel(lines, options.processes),
+                data, lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Peak RSS of a RADB-sized IRR database plus a full BGP table, with the
+    old per-node lists and boxed ints versus the shared origin tuples and
+    ASNs of irrdb.OriginTable
+
+    The route objects are synthetic but shaped like RADB: most prefixes
+    have one origin, origins follow a long tailed distribution over
+    ~60000 ASNs, every route object arrives as a freshly parsed string.
+
+    Usage:
+        python benchmarks/bench_payload.py [route objects] [bgp prefixes]
+"""
+
+import sys
+import random
+import resource
+import multiprocessing
+
+import radix
+
+sys.path.insert(0, '.')
+
+from irrexplorer import bgp, irrdb
+
+ASNS = 60000
+
+
+class ListIRRDatabase(object):
+    """ IRRDatabase.add_route as it was, a list per node """
+
+    def __init__(self):
+        self.tree = radix.Radix()
+        self.asn_prefix_map = {}
+
+    def add_route(self, prefix, origin):
+        rnode = self.tree.search_exact(prefix)
+        if not rnode:
+            rnode = self.tree.add(prefix)
+            rnode.data['origins'] = [origin]
+        elif origin not in rnode.data['origins']:
+            rnode.data['origins'] = rnode.data['origins'] + [origin]
+        self.asn_prefix_map.setdefault(origin, set()).add(prefix)
+
+
+def route_objects(count):
+    rnd = random.Random(42)
+    for i in range(count):
+        origin = int(rnd.paretovariate(0.6)) % ASNS + 1
+        n = rnd.randint(0, count / 2)
+        if rnd.random() < 0.15:
+            # the same prefix registered with another origin
+            n = n & ~1
+        prefix = "%i.%i.%i.0/24" % (n >> 16 & 255 or 1, n >> 8 & 255, n & 255)
+        # parsed objects never share their strings or ints
+        yield ''.join(list(prefix)), int(str(origin))
+
+
+def bgp_table(count):
+    rnd = random.Random(7)
+    for n in range(count):
+        origin = int(rnd.paretovariate(0.6)) % ASNS + 1
+        yield "%i.%i.%i.0/24" % (n >> 16 & 255 or 1, n >> 8 & 255, n & 255), \
+            int(str(origin))
+
+
+def load(compact, routes, bgp_prefixes, results):
+    rss_start = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db = irrdb.IRRDatabase() if compact else ListIRRDatabase()
+    for prefix, origin in route_objects(routes):
+        db.add_route(prefix, origin)
+
+    worker = bgp.BGPWorker(None, None)
+    if not compact:
+        worker.origin_table.asn = lambda asn: asn
+    worker.apply_table(bgp_table(bgp_prefixes))
+    results.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss -
+                rss_start)
+
+
+def main():
+    routes = int(sys.argv[1]) if len(sys.argv) > 1 else 1200000
+    bgp_prefixes = int(sys.argv[2]) if len(sys.argv) > 2 else 600000
+    results = multiprocessing.Queue()
+    print "%i route objects, %i BGP prefixes" % (routes, bgp_prefixes)
+    for compact in [False, True]:
+        p = multiprocessing.Process(target=load, args=(compact, routes,
+                                                       bgp_prefixes, results))
+        p.start()
+        rss = results.get()
+        p.join()
+        print "%-8s %6i MB" % ('shared' if compact else 'lists', rss / 1024)
+
+
+if __name__ == '__main__':
+    main()
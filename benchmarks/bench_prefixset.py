@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Compare the two ways of answering a BGP "prefixset" lookup
+
+        old:    set(target) & set(table), a set of the whole table per query
+        packed: membership tests against the persistent set of packed keys
+
+    Usage:
+        python benchmarks/bench_prefixset.py [table size] [target size]
+"""
+
+import sys
+import time
+import random
+
+sys.path.insert(0, '.')
+
+from irrexplorer import bgp, prefixindex
+
+QUERIES = 20
+
+
+def main():
+    table_size = int(sys.argv[1]) if len(sys.argv) > 1 else 600000
+    target_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rnd = random.Random(42)
+
+    table = ["%i.%i.%i.0/24" % (i >> 16 & 255 or 1, i >> 8 & 255, i & 255)
+             for i in range(table_size)]
+    t_start = time.time()
+    prefix_keys = set(prefixindex.pack_prefix(p) for p in table)
+    print "packed %i prefixes in %.2f seconds" % (table_size,
+                                                   time.time() - t_start)
+
+    targets = [[rnd.choice(table) if rnd.random() < 0.5 else
+                "%i.%i.0.0/16" % (rnd.randint(1, 223), rnd.randint(0, 255))
+                for _ in range(target_size)] for _ in range(QUERIES)]
+
+    t_start = time.time()
+    old = [set(target) & set(table) for target in targets]
+    t_old = (time.time() - t_start) / QUERIES
+
+    t_start = time.time()
+    new = [bgp.prefixset(prefix_keys, target) for target in targets]
+    t_new = (time.time() - t_start) / QUERIES
+
+    assert old == new
+    print "old:    %.2f ms per query" % (t_old * 1e3)
+    print "packed: %.2f ms per query" % (t_new * 1e3)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,6 +30,16 @@ from irrexplorer import nrtm
 from irrexplorer import ripe
 from irrexplorer import bgp
 from irrexplorer import utils
+from irrexplorer import prefixindex
+from irrexplorer import dispatch
+from irrexplorer import snapshot
+from irrexplorer import irrdb
+from irrexplorer import cache
+from irrexplorer import assets
+from irrexplorer import advice
+from irrexplorer import jobs
+from irrexplorer import rwlock
+from irrexplorer import status as load_status
 
 import time
 import ipaddr
@@ -37,9 +47,11 @@ import threading
 import multiprocessing
 import radix
 import json
+import os
+from collections import OrderedDict
 
 from flask import Flask, render_template, request, flash, redirect, \
-    url_for, abort
+    url_for, abort, Response
 from flask_bootstrap import Bootstrap
 from flask_wtf import Form
 from wtforms import TextField, SubmitField
@@ -54,8 +66,11 @@ class NoPrefixError(Exception):
 
 class LookupWorker(threading.Thread):
     def __init__(self, tree, asn_prefix_map, assets,
-                 lookup_queue, result_queue):
+                 lookup_queue, result_queue, lock=None):
         threading.Thread.__init__(self)
+        if lock is None:
+            lock = rwlock.ReadWriteLock()
+        self.lock = lock
         self.tree = tree
         self.lookup_queue = lookup_queue
         self.result_queue = result_queue
@@ -64,79 +79,193 @@ class LookupWorker(threading.Thread):
 
     def run(self):
         while True:
-            lookup, target = self.lookup_queue.get()
+            request_id, lookup, target = self.lookup_queue.get()
             results = {}
             if not lookup:
                 continue
 
-            if lookup == "search_specifics":
-                data = None
-                for rnode in self.tree.search_covered(target):
-                    prefix = rnode.prefix
-                    origins = rnode.data['origins']
-                    results[prefix] = {}
-                    results[prefix]['origins'] = origins
-                self.result_queue.put(results)
-
-            elif lookup == "search_aggregate":
-                rnode = self.tree.search_worst(target)
-                if not rnode:
-                    self.result_queue.put(None)
-                else:
-                    prefix = rnode.prefix
-                    data = rnode.data
-                    self.result_queue.put((prefix, data))
-
-            elif lookup == "search_exact":
-                rnode = self.tree.search_exact(target)
-                if not rnode:
-                    self.result_queue.put({})
-                else:
-                    prefix = rnode.prefix
-                    origins = rnode.data['origins']
-                    results[prefix] = {}
-                    results[prefix]['origins'] = origins
-                    self.result_queue.put(results)
-
-            elif lookup == "inverseasn":
-                if target in self.asn_prefix_map:
-                    self.result_queue.put(self.asn_prefix_map[target])
-                else:
-                    self.result_queue.put([])
-
-            elif lookup == "asset_search":
-                if target in self.assets:
-                    self.result_queue.put(self.assets[target])
-                else:
-                    self.result_queue.put([])
+            # the writer holds the lock while it applies an update, so a
+            # lookup never sees half of one
+            with self.lock.reading():
+                if lookup == "search_specifics":
+                    data = None
+                    for rnode in self.tree.search_covered(target):
+                        prefix = rnode.prefix
+                        origins = rnode.data['origins']
+                        results[prefix] = {}
+                        results[prefix]['origins'] = origins
+                    self.result_queue.put((request_id, results))
+
+                elif lookup == "search_aggregate":
+                    rnode = self.tree.search_worst(target)
+                    if not rnode:
+                        self.result_queue.put((request_id, None))
+                    else:
+                        prefix = rnode.prefix
+                        data = dict(rnode.data)
+                        self.result_queue.put((request_id, (prefix, data)))
+
+                elif lookup == "search_exact":
+                    rnode = self.tree.search_exact(target)
+                    if not rnode:
+                        self.result_queue.put((request_id, {}))
+                    else:
+                        prefix = rnode.prefix
+                        origins = rnode.data['origins']
+                        results[prefix] = {}
+                        results[prefix]['origins'] = origins
+                        self.result_queue.put((request_id, results))
+
+                elif lookup == "search_exact_many":
+                    for prefix in target:
+                        rnode = self.tree.search_exact(prefix)
+                        if rnode:
+                            results[rnode.prefix] = {'origins': rnode.data['origins']}
+                    self.result_queue.put((request_id, results))
+
+                elif lookup == "inverseasn":
+                    if target in self.asn_prefix_map:
+                        self.result_queue.put((request_id, set(self.asn_prefix_map[target])))
+                    else:
+                        self.result_queue.put((request_id, []))
+
+                elif lookup == "asset_search":
+                    if target.upper() in self.assets:
+                        self.result_queue.put((request_id, self.assets[target.upper()]))
+                    else:
+                        self.result_queue.put((request_id, []))
+
+                elif lookup == "asset_search_many":
+                    for name in target:
+                        members = self.assets.get(name)
+                        if members is not None:
+                            results[name] = members
+                    self.result_queue.put((request_id, results))
 
             self.lookup_queue.task_done()
 
 
-class NRTMWorker(multiprocessing.Process):
+class NRTMFollower(object):
+    """
+    Applies the updates of an NRTM feed to self.db. Expects the feed,
+    dbname, db, lock, serial, status, publisher and notifier attributes of
+    NRTMWorker. Every update is applied under the write side of the
+    rwlock.ReadWriteLock the lookup thread reads under.
+    """
+
+    def follow(self):
+        """ apply the updates of self.feed, forever """
+        self.status.set_serial(self.serial)
+        while True:
+            for cmd, serial, obj in self.feed.get():
+                if not obj:
+                    continue
+                try:
+                    if not self.dbname == obj['source']:
+                        """ ignore updates for which the source does not
+                        match the configured/expected database """
+                        continue
+                except KeyError:
+                    print "ERROR: NRTM object without source in %s: %s" % (self.dbname, obj)
+                    continue
+
+                with self.lock.writing():
+                    self.apply_update(cmd, obj)
+                    if serial:
+                        self.serial = serial
+                self.status.applied()
+                if serial:
+                    self.status.set_serial(serial)
+
+    def apply_update(self, cmd, obj):
+        """
+        Apply a single ADD or DEL of a parsed RPSL object to the tree, the
+        inverse ASN map and the as-sets.
+        """
+        if obj['kind'] in ["route", "route6"]:
+            if cmd == "ADD":
+                try:
+                    ipaddr.IPNetwork(obj['name'])
+                except ValueError:
+                    print "ERROR: non-valid stuff in %s: %s" \
+                        % (self.dbname, obj)
+                    return
+                self.db.add_route(obj['name'], obj['origin'])
+            else:
+                try:
+                    self.db.delete_route(obj['name'], obj['origin'])
+                except KeyError:
+                    print "ERROR: Could not remove object from the tree in %s: %s" % (self.dbname, obj)
+
+            if self.publisher:
+                self.publisher.mark_dirty()
+            if self.notifier:
+                self.notifier.changed(obj['name'])
+
+        if obj['kind'] == "as-set":
+            if cmd == "ADD":
+                self.db.add_asset(obj['name'], obj['members'])
+            else:
+                try:
+                    self.db.delete_asset(obj['name'])
+                except KeyError:
+                    print "ERROR: Could not remove unknown as-set in %s: %s" % (self.dbname, obj)
+
+            if self.asset_notifier:
+                self.asset_notifier.changed(obj['name'])
+
+
+class NRTMWorker(NRTMFollower, multiprocessing.Process):
     """
     Launches an nrtm.client() instance and feeds the output in to a
     radix tree. Somehow allow other processes to lookup entries in the
     radix tree. Destroy & rebuild radix tree when serial overruns and
     a new connection must be established with the NRTM host.
     """
-    def __init__(self, feedconfig, lookup_queue, result_queue):
+    def __init__(self, feedconfig, lookup_queue, result_queue,
+                 index_path=None, snapshot_path=None, change_queue=None,
+                 asset_change_queue=None, status=None):
         """
         Constructor.
         @param config dict() with NRTM host information
         @param nrtm_queue Queue() where NRTM output goes
+        @param index_path where to publish the prefix index, or None
+        @param snapshot_path where to keep the warm restart snapshot, or None
+        @param change_queue Queue() where changed prefixes are reported
+        @param asset_change_queue Queue() where changed as-sets are reported
+        @param status status.LoadStatus() to report the load progress in
         """
         multiprocessing.Process.__init__(self)
         self.feedconfig = feedconfig
+        if status is None:
+            status = load_status.LoadStatus(feedconfig['dbname'])
+        self.status = status
         self.lookup_queue = lookup_queue
         self.result_queue = result_queue
-        self.tree = radix.Radix()
+        self.index_path = index_path
+        if index_path:
+            prefixindex.remove_index(index_path)
+        self.publisher = None
+        self.notifier = None
+        if change_queue is not None:
+            self.notifier = cache.ChangeNotifier(change_queue,
+                                                 feedconfig['dbname'])
+        self.asset_notifier = None
+        if asset_change_queue is not None:
+            self.asset_notifier = cache.ChangeNotifier(asset_change_queue,
+                                                       feedconfig['dbname'])
+        self.snapshot_path = snapshot_path
+        self.snapshot_writer = None
+        self.lock = rwlock.ReadWriteLock()
+        self.serial = None
+        self.db = irrdb.IRRDatabase()
+        self.tree = self.db.tree
         self.dbname = feedconfig['dbname']
-        self.asn_prefix_map = {}
-        self.assets = {}
-        self.ready_event = multiprocessing.Event()
+        self.asn_prefix_map = self.db.asn_prefix_map
+        self.assets = self.db.assets
         self.lookup = LookupWorker(self.tree, self.asn_prefix_map, self.assets,
-                                   self.lookup_queue, self.result_queue)
+                                   self.lookup_queue, self.result_queue,
+                                   self.lock)
 
 # TODO
 # add completly new rnode from irr
@@ -153,131 +282,313 @@ class NRTMWorker(multiprocessing.Process):
         self.lookup.setDaemon(True)
         self.lookup.start()
 
+        if self.index_path:
+            self.publisher = prefixindex.IndexPublisher(
+                self.tree, self.index_path, notifier=self.notifier,
+                ready_event=self.status.ready_event, lock=self.lock)
+            self.publisher.setDaemon(True)
+            self.publisher.start()
+        elif self.notifier:
+            self.notifier.setDaemon(True)
+            self.notifier.start()
+        if self.asset_notifier:
+            self.asset_notifier.setDaemon(True)
+            self.asset_notifier.start()
+
+        feedconfig = dict(self.feedconfig)
+        feedconfig['on_loaded'] = self.status.set_ready
+        if self.snapshot_path:
+            state = snapshot.load_snapshot(self.snapshot_path, self.dbname)
+            if state:
+                snapshot.restore(state, self.tree, self.asn_prefix_map,
+                                 self.assets)
+                feedconfig['serialoverride'] = state['serial']
+                feedconfig['dump'] = None
+                print "INFO: restored %s from snapshot at serial %i" % \
+                    (self.dbname, state['serial'])
+
+        self.feed = nrtm.client(**feedconfig)
+        self.serial = self.feed.serial
+
+        if self.snapshot_path:
+            self.snapshot_writer = snapshot.SnapshotWriter(self,
+                                                           self.snapshot_path)
+            self.snapshot_writer.setDaemon(True)
+            self.snapshot_writer.start()
+
+        self.follow()
+
+
+class NRTMFeed(NRTMFollower, threading.Thread):
+    """
+    Follows the NRTM feed of one database for ConsolidatedNRTMWorker
+    """
+    def __init__(self, feedconfig, db, lock, notifier, asset_notifier,
+                 status):
+        threading.Thread.__init__(self)
+        self.feedconfig = dict(feedconfig, on_loaded=status.set_ready)
+        self.status = status
+        self.dbname = feedconfig['dbname']
+        self.db = db
+        self.lock = lock
+        self.serial = None
+        self.publisher = None
+        self.notifier = notifier
+        self.asset_notifier = asset_notifier
+
+    def run(self):
         self.feed = nrtm.client(**self.feedconfig)
-        while True:
-            for cmd, serial, obj in self.feed.get():
-                if not obj:
-                    continue
-                try:
-                    if not self.dbname == obj['source']:
-                        """ ignore updates for which the source does not
-                        match the configured/expected database """
-                        continue
-                except KeyError:
-                    print "ERROR: NRTM object without source in %s: %s" % (self.dbname, obj)
-                    continue
+        self.serial = self.feed.serial
+        self.follow()
 
-                if obj['kind'] in ["route", "route6"]:
-                    if cmd == "ADD":
-                        try:
-                            ipaddr.IPNetwork(obj['name'])
-                        except ValueError:
-                            print "ERROR: non-valid stuff in %s: %s" \
-                                % (self.dbname, obj)
-                            continue
-                        if not self.tree.search_exact(obj['name']):
-                            # FIXME does sometimes fails in the pure python
-                            # py-radix
-                            rnode = self.tree.add(obj['name'])
-                            rnode.data['origins'] = [obj['origin']]
-                        else:
-                            rnode = self.tree.search_exact(obj['name'])
-                            rnode.data['origins'] = list(set([obj['origin']] + list(rnode.data['origins'])))
-
-                        # add prefix to the inverse ASN map
-                        if obj['origin'] not in self.asn_prefix_map:
-                            self.asn_prefix_map[obj['origin']] = [obj['name']]
-                        else:
-                            self.asn_prefix_map[obj['origin']].append(obj['name'])
-                    else:
-                        try:
-                            self.tree.delete(obj['name'])
-                            self.asn_prefix_map[obj['origin']].remove(obj['name'])
-                        except KeyError:
-                            print "ERROR: Could not remove object from the tree in %s: %s" % (self.dbname, obj)
-
-                if obj['kind'] == "as-set":
-                    if cmd == "ADD":
-                        self.assets[obj['name']] = obj['members']
-                    else:
-                        del self.assets[obj['name']]
 
-        print 'Done parsing database %s' % self.dbname
-        self.ready_event.set()
+class MultiLookupWorker(threading.Thread):
+    """
+    Answers lookups from a MultiIRRDatabase, with a result per database
+    """
+    LOOKUPS = ['search_specifics', 'search_aggregate', 'search_exact',
+               'search_exact_many', 'inverseasn', 'asset_search',
+               'asset_search_many']
 
+    def __init__(self, db, lookup_queue, result_queue, lock):
+        threading.Thread.__init__(self)
+        self.db = db
+        self.lock = lock
+        self.lookup_queue = lookup_queue
+        self.result_queue = result_queue
 
+    def run(self):
+        while True:
+            request_id, lookup, target = self.lookup_queue.get()
+            if lookup in self.LOOKUPS:
+                with self.lock.reading():
+                    result = getattr(self.db, lookup)(target)
+                self.result_queue.put((request_id, result))
+            self.lookup_queue.task_done()
+
+
+class ConsolidatedNRTMWorker(multiprocessing.Process):
+    """
+    Follows the NRTM feeds of all databases in to a single tree, see
+    irrdb.MultiIRRDatabase. Lookups are answered for all databases at
+    once. There is no prefix index or snapshot support in this mode.
+    """
+    def __init__(self, feedconfigs, lookup_queue, result_queue,
+                 change_queue=None, asset_change_queue=None, statuses=None):
+        """
+        @param feedconfigs dict() database name -> NRTM host information
+        @param statuses dict() database name -> status.LoadStatus()
+        """
+        multiprocessing.Process.__init__(self)
+        self.feedconfigs = feedconfigs
+        if statuses is None:
+            statuses = dict((name, load_status.LoadStatus(name))
+                            for name in feedconfigs)
+        self.statuses = statuses
+        self.db = irrdb.MultiIRRDatabase(sorted(feedconfigs))
+        self.lock = rwlock.ReadWriteLock()
+        self.notifier = None
+        if change_queue is not None:
+            self.notifier = cache.ChangeNotifier(change_queue,
+                                                 CONSOLIDATED_IRR)
+        self.asset_notifier = None
+        if asset_change_queue is not None:
+            self.asset_notifier = cache.ChangeNotifier(asset_change_queue,
+                                                       CONSOLIDATED_IRR)
+        self.lookup = MultiLookupWorker(self.db, lookup_queue, result_queue,
+                                        self.lock)
 
-databases = config('irrexplorer_config.yml').databases
+    def run(self):
+        self.lookup.setDaemon(True)
+        self.lookup.start()
+        for notifier in [self.notifier, self.asset_notifier]:
+            if notifier:
+                notifier.setDaemon(True)
+                notifier.start()
+
+        feeds = []
+        for name, feedconfig in sorted(self.feedconfigs.items()):
+            feed = NRTMFeed(feedconfig, self.db.database(name), self.lock,
+                            self.notifier, self.asset_notifier,
+                            self.statuses[name])
+            feed.setDaemon(True)
+            feed.start()
+            feeds.append(feed)
+        for feed in feeds:
+            feed.join()
+
+
+CONSOLIDATED_IRR = 'IRR'
+
+irrexplorer_config = config('irrexplorer_config.yml')
+databases = irrexplorer_config.databases
 lookup_queues = {}
 result_queues = {}
+prefix_indexes = {}
+change_queue = multiprocessing.Queue()
+report_cache = cache.ReportCache()
+report_cache.follow(change_queue)
+asset_change_queue = multiprocessing.Queue()
+
+for d in [irrexplorer_config.index_dir, irrexplorer_config.snapshot_dir]:
+    if d and not os.path.isdir(d):
+        os.makedirs(d)
+
+
+def index_path(name):
+    if not irrexplorer_config.index_dir:
+        return None
+    return os.path.join(irrexplorer_config.index_dir, '%s.idx' % name)
+
+
+def snapshot_path(name):
+    if not irrexplorer_config.snapshot_dir:
+        return None
+    return os.path.join(irrexplorer_config.snapshot_dir, '%s.snapshot' % name)
 
 nrtm_workers = []
+feedconfigs = {}
+# per data source load progress, shared with the workers
+load_statuses = OrderedDict()
 
 for dbase in databases:
     name = dbase.keys()[0]
     feedconfig = dbase[name]
-    feedconfig = dict(d.items()[0] for d in feedconfig)
-    lookup_queues[name] = multiprocessing.JoinableQueue()
-    result_queues[name] = multiprocessing.JoinableQueue()
-    worker = NRTMWorker(feedconfig, lookup_queues[name], result_queues[name])
+    feedconfigs[name] = dict(d.items()[0] for d in feedconfig)
+
+for name in sorted(feedconfigs) + ['BGP']:
+    load_statuses[name] = load_status.LoadStatus(name)
+
+if irrexplorer_config.consolidated:
+    lookup_queues[CONSOLIDATED_IRR] = multiprocessing.JoinableQueue()
+    result_queues[CONSOLIDATED_IRR] = multiprocessing.JoinableQueue()
+    worker = ConsolidatedNRTMWorker(feedconfigs,
+                                    lookup_queues[CONSOLIDATED_IRR],
+                                    result_queues[CONSOLIDATED_IRR],
+                                    change_queue, asset_change_queue,
+                                    load_statuses)
     worker.start()
     nrtm_workers.append(worker)
+else:
+    for name, feedconfig in sorted(feedconfigs.items()):
+        lookup_queues[name] = multiprocessing.JoinableQueue()
+        result_queues[name] = multiprocessing.JoinableQueue()
+        worker = NRTMWorker(feedconfig, lookup_queues[name],
+                            result_queues[name], index_path(name),
+                            snapshot_path(name), change_queue,
+                            asset_change_queue, load_statuses[name])
+        worker.start()
+        if index_path(name):
+            prefix_indexes[name] = prefixindex.PrefixIndex(index_path(name))
+        nrtm_workers.append(worker)
 
 # Launch helper processes for BGP & RIPE managed space lookups
 for q in ['RIPE-AUTH', 'BGP']:
     lookup_queues[q] = multiprocessing.JoinableQueue()
     result_queues[q] = multiprocessing.JoinableQueue()
 
-bgp_worker = bgp.BGPWorker(lookup_queues['BGP'], result_queues['BGP'])
+bgp_worker = bgp.BGPWorker(lookup_queues['BGP'], result_queues['BGP'],
+                           index_path=index_path('BGP'),
+                           exabgp_source=irrexplorer_config.exabgp_source,
+                           change_queue=change_queue,
+                           status=load_statuses['BGP'])
 bgp_worker.start()
+if index_path('BGP'):
+    prefix_indexes['BGP'] = prefixindex.PrefixIndex(index_path('BGP'))
 
 ripe_worker = ripe.RIPEWorker(lookup_queues['RIPE-AUTH'], result_queues['RIPE-AUTH'])
 ripe_worker.start()
 ripe_worker.ready_event.wait() # instant with current code
 
-# wait until all workers are ready
-for idx, nw in  enumerate(nrtm_workers):
-    # nw.ready_event.wait()
-    # somehow just wait() doesn't work, but with timeout it does...
-    if nw.ready_event.wait(10):
-        print 'NRTM worker %i ready' % idx
-    else:
-        print 'NRTM worker %i still waiting' % idx
+# the RIPE managed space is tiny, check it in-process rather than asking
+# the RIPE-AUTH worker once per prefix
+ripe_managed_space = ripe.RIPEManagedSpace()
 
-print 'All NRTM workers ready'
+# the workers answer lookups while they load, see /status and
+# loading_sources() for which ones are complete
+dispatcher = dispatch.Dispatcher(lookup_queues, result_queues)
+dispatcher.start()
 
-bgp_worker.ready_event.wait()
-print 'BGP worker ready, continuing'
 
+def loading_sources():
+    """ the data sources which have not finished their initial load """
+    return [name for name, s in load_statuses.items() if not s.is_ready()]
 
-def irr_query(query_type, target):
-    global lookup_queues
-    global result_queues
-    for i in lookup_queues:
-        if i in ['BGP', 'RIPE-AUTH']:
-            continue
-        print "doing lookup for %s in %s" % (target, i)
-        lookup_queues[i].put((query_type, target))
+
+def missing_sources(answered):
+    """ the IRR databases which are not in answered """
+    return [name for name in sorted(feedconfigs) if name not in answered]
+
+
+def fetch_asset_members(names):
+    """ members of the as-sets in names, per IRR database """
+    return irr_query("asset_search_many", names)
+
+
+def complete_answer(answered):
+    """ whether every IRR database answered and none is still loading """
+    return not missing_sources(answered) and \
+        not [name for name in loading_sources() if name in feedconfigs]
+
+asset_expander = assets.ASSetExpander(fetch_asset_members,
+                                      complete=complete_answer)
+asset_expander.follow(asset_change_queue)
+
+
+INDEX_QUERIES = ['search_specifics', 'search_aggregate', 'search_exact']
+
+
+def index_query(data_source, query_type, target):
+    """
+    Answer a lookup from the published prefix index of data_source.
+    Returns (True, result) on success, (False, None) when the lookup has
+    to go through the worker queues.
+    """
+    if query_type not in INDEX_QUERIES or data_source not in prefix_indexes:
+        return False, None
+    index = prefix_indexes[data_source]
+    if not index.available:
+        return False, None
+    return True, index.lookup(query_type, target)
+
+
+def irr_query(query_type, target, on_result=None):
+    """
+    Ask every IRR database, databases which do not answer within the
+    dispatcher timeout are left out of the result. on_result is called with
+    (database, result) for every answer as it comes in.
+    """
+    if CONSOLIDATED_IRR in lookup_queues:
+        result = dispatcher.query([CONSOLIDATED_IRR], query_type, target)
+        result = result.get(CONSOLIDATED_IRR, {})
+        if on_result is not None:
+            for db, data in result.items():
+                on_result(db, data)
+        return result
+
+    result = {}
+    queued = []
     for i in lookup_queues:
         if i in ['BGP', 'RIPE-AUTH']:
             continue
-        lookup_queues[i].join()
-    result = {}
-    for i in result_queues:
-        if i in ['BGP', 'RIPE-AUTH']:
+        found, data = index_query(i, query_type, target)
+        if found:
+            result[i] = data
+            if on_result is not None:
+                on_result(i, data)
             continue
-        result[i] = result_queues[i].get()
-        result_queues[i].task_done()
+        print "doing lookup for %s in %s" % (target, i)
+        queued.append(i)
+    if queued:
+        result.update(dispatcher.query(queued, query_type, target,
+                                       on_result=on_result))
     return result
 
 def other_query(data_source, query_type, target):
-    global lookup_queues
-    global result_queues
-    lookup_queues[data_source].put((query_type, target))
-    lookup_queues[data_source].join()
-    result = result_queues[data_source].get()
-    result_queues[data_source].task_done()
-    return result
+    found, data = index_query(data_source, query_type, target)
+    if found:
+        return data
+    return dispatcher.query_one(data_source, query_type, target)
 
 
 def bgp_query():
@@ -288,10 +599,55 @@ def ripe_query():
     pass
 
 
-IRR_DBS = ['afrinic', 'altdb', 'apnic', 'arin', 'bboi', 'bell', 'gt', 'jpirr', 'level3', 'nttcom', 'radb', 'rgnet', 'savvis', 'tc', 'ripe']
+job_pool = jobs.JobPool()
+job_pool.start()
+
+
+def prefix_report_job(job, prefix, exact):
+    job.info['loading'] = loading_sources()
+    report, missing = prefix_report(prefix, exact, progress=job.progress)
+    job.info['missing'] = missing
+    return report
 
-IRR_DBS_EXCEPT_RIPE = IRR_DBS[:]
-IRR_DBS_EXCEPT_RIPE.remove('ripe')
+
+def loading_headers(missing=None):
+    """
+    response headers naming the sources a report may lack data from, the
+    ones still loading and the ones in missing, which did not answer
+    """
+    headers = {}
+    loading = loading_sources()
+    if loading:
+        headers['X-Loading-Sources'] = ','.join(loading)
+    if missing:
+        headers['X-Missing-Sources'] = ','.join(missing)
+    return headers
+
+
+MAX_BULK_PREFIXES = 10000
+
+
+def bulk_prefix_report(prefixes):
+    """
+    Generate one dict per requested prefix, see utils.bulk_report
+    """
+    loading = loading_sources()
+
+    def report(aggregate, missing):
+        return prefix_report(aggregate, aggregate=aggregate, missing=missing)
+
+    def not_found_row(prefix, report):
+        return advice.not_found_row(
+            report, bool(ripe_managed_space.is_covered(prefix)))
+
+    for result in utils.bulk_report(prefixes, find_aggregate, report,
+                                    not_found_row):
+        if loading and 'report' in result:
+            result['loading'] = loading
+        yield result
+
+
+IRR_DBS = advice.DATABASES
 
 
 def prefix_post_process(prefixes):
@@ -332,38 +688,80 @@ def prefix_post_process(prefixes):
 
 
 
-def prefix_report(prefix, exact=False):
+def prefix_report(prefix, exact=False, progress=None, aggregate=None,
+                  missing=None):
+    """
+    Cached prefix report, see build_prefix_report. The returned dict is
+    shared with the cache and must not be modified. Only complete reports
+    are cached: not while data sources are still loading, and not when an
+    IRR database did not answer in time. A caller which already found the
+    aggregate of prefix passes it, together with the IRR databases that
+    did not answer while finding it.
+
+    Returns:
+        (report, the IRR databases missing from the report)
     """
-        - find least specific
+    def build():
+        return build_prefix_report(prefix, exact, progress, aggregate,
+                                   missing)
+    return report_cache.report(prefix, exact, build,
+                               complete=not loading_sources())
+
+
+def find_aggregate(prefix, missing=None):
+    """
+    The least specific prefix covering prefix in BGP or any IRR database.
+    IRR databases which did not answer are added to the missing list.
+    """
+    tree = radix.Radix()
+    bgp_aggregate = other_query("BGP", "search_aggregate", prefix)
+    if bgp_aggregate:
+        bgp_aggregate = bgp_aggregate[0]
+        tree.add(bgp_aggregate)
+    irr_aggregate = irr_query("search_aggregate", prefix)
+    if missing is not None:
+        missing.extend(missing_sources(irr_aggregate))
+    for r in irr_aggregate:
+        if irr_aggregate[r]:
+            tree.add(irr_aggregate[r][0])
+    aggregate = tree.search_worst(prefix)
+    if not aggregate:
+        raise NoPrefixError("Could not find any matching prefix in IRR or BGP tables for %s" % prefix)
+
+    return aggregate.prefix
+
+
+def build_prefix_report(prefix, exact=False, progress=None, aggregate=None,
+                        missing=None):
+    """
+        - find least specific, unless the caller passed it as aggregate
         - search in BGP for more specifics
         - search in IRR for more specifics
         - check all prefixes whether they are RIPE managed or not
-        - return dict
+        - return the aggregate the report covers, the report dict and the
+          IRR databases which did not answer
+
+        progress is called with (source, specifics) as every source answers,
+        missing lists the IRR databases already known to have not answered
     """
 
     t_start = time.time()
 
+    missing = list(missing or [])
     if exact:
+        aggregate = prefix
         bgp_specifics = other_query("BGP", "search_exact", prefix)
-        irr_specifics = irr_query("search_exact", prefix)
+        if progress is not None:
+            progress("BGP", bgp_specifics)
+        irr_specifics = irr_query("search_exact", prefix, progress)
     else:
-        tree = radix.Radix()
-        bgp_aggregate = other_query("BGP", "search_aggregate", prefix)
-        if bgp_aggregate:
-            bgp_aggregate = bgp_aggregate[0]
-            tree.add(bgp_aggregate)
-        irr_aggregate = irr_query("search_aggregate", prefix)
-        for r in irr_aggregate:
-            if irr_aggregate[r]:
-                tree.add(irr_aggregate[r][0])
-        aggregate = tree.search_worst(prefix)
-        if not aggregate:
-            raise NoPrefixError("Could not find any matching prefix in IRR or BGP tables for %s" % prefix)
-
-        aggregate = aggregate.prefix
-
+        if aggregate is None:
+            aggregate = find_aggregate(prefix, missing)
         bgp_specifics = other_query("BGP", "search_specifics", aggregate)
-        irr_specifics = irr_query("search_specifics", aggregate)
+        if progress is not None:
+            progress("BGP", bgp_specifics)
+        irr_specifics = irr_query("search_specifics", aggregate, progress)
+    missing = sorted(set(missing + missing_sources(irr_specifics)))
 
     prefixes = {}
     for p in bgp_specifics:
@@ -395,104 +793,68 @@ def prefix_report(prefix, exact=False):
         for p in irr_specifics[db]:
             prefixes.setdefault(p, {})[db] = irr_specifics[db][p]['origins']
 
-    for p in prefixes:
-        if other_query("RIPE-AUTH", "is_covered", p):
-            prefixes[p]['ripe_managed'] = True
-        else:
-            prefixes[p]['ripe_managed'] = False
-
-    # default, primary, succes, info, warning, danger
-    for p in prefixes:
-        print p
-        print prefixes[p]
-
-        anywhere = []
-        for db in IRR_DBS:
-            if not db in prefixes[p]:
-                continue
-            if prefixes[p][db]:
-                for entry in prefixes[p][db]:
-                    anywhere.append(entry)
-        anywhere = list(set(anywhere))
-
-        anywhere_not_ripe = []
-        for db in IRR_DBS_EXCEPT_RIPE:
-            if not db in prefixes[p]:
-                continue
-            if prefixes[p][db]:
-                for entry in prefixes[p][db]:
-                    anywhere_not_ripe.append(entry)
-        anywhere_not_ripe = list(set(anywhere_not_ripe))
-
-        if prefixes[p]['ripe_managed']:
-
-            if prefixes[p]['ripe']:
-
-                if prefixes[p]['bgp_origin'] in prefixes[p]['ripe']:
+    prefixes = classify_prefixes(prefixes)
 
-                    if len(anywhere) == 1 and prefixes[p]['bgp_origin'] not in anywhere_not_ripe:
-                        prefixes[p]['advice'] = "Perfect"
-                        prefixes[p]['label'] = "success"
-
-                    elif prefixes[p]['bgp_origin'] == anywhere_not_ripe:
-                        prefixes[p]['advice'] = "Proper RIPE DB object, but foreign or proxy objects also exist"
-                        prefixes[p]['label'] = "warning"
+    t_delta = time.time() - t_start
+    print
+    print 'Time for prefix report for %s: %f' % (prefix, t_delta)
+    print
 
-                    elif prefixes[p]['bgp_origin'] in anywhere_not_ripe:
-                        prefixes[p]['advice'] = "Proper RIPE DB object, but foreign objects also exist, consider removing these"
-                        prefixes[p]['label'] = "warning"
+    return aggregate, prefixes, missing
 
-                    else:
-                        prefixes[p]['advice'] = "Looks good, but multiple entries exists in RIPE DB"
-                        prefixes[p]['label'] = "success"
 
-                elif prefixes[p]['bgp_origin']:
-                    prefixes[p]['advice'] = "Prefix is in DFZ, but registered with wrong origin in RIPE!"
-                    prefixes[p]['label'] = "danger"
+def classify_prefixes(prefixes):
+    """
+    Add the RIPE managed flag and the advice to every prefix, prefixes maps
+    prefix -> {'bgp_origin': origin or False, irr database: origins or False}
+    """
+    ripe_managed = ripe_managed_space.is_covered_many(prefixes.keys())
+    for p in prefixes:
+        prefixes[p]['ripe_managed'] = bool(ripe_managed[p])
 
-                else:
-                    # same as last else clause, not sure if this could actually be first
-                    prefixes[p]['advice'] = "Not seen in BGP, but (legacy?) route-objects exist, consider clean-up"
-                    prefixes[p]['label'] = "warning"
+    # default, primary, succes, info, warning, danger
+    advice.classify_rows(prefixes.values())
 
-            else:   # no ripe registration
+    prefixes, msg = prefix_post_process(prefixes)
+    print msg # have to get this into the web page as well...
 
-                if prefixes[p]['bgp_origin']:
-                    prefixes[p]['advice'] = "Prefix is in DFZ, but NOT registered in RIPE!"
-                    prefixes[p]['label'] = "danger"
+    return prefixes
 
-                else:
-                    prefixes[p]['advice'] = "Route objects in foreign registries exist, consider moving them to RIPE DB"
-                    prefixes[p]['label'] = "warning"
 
-        elif prefixes[p]['bgp_origin']: # not ripe managed
+def autnum_report(asn):
+    """
+    Report on every prefix which asn originates in BGP or has a route
+    object for in any IRR database, classified like a prefix report.
+    The per database origins of these prefixes are fetched with one
+    search_exact_many lookup per source.
+    """
+    t_start = time.time()
 
-            if prefixes[p]['bgp_origin'] in anywhere:
+    bgp_prefixes = set(other_query("BGP", "inverseasn", asn))
+    irr_prefixes = irr_query("inverseasn", asn)
+    candidates = bgp_prefixes.union(*irr_prefixes.values())
+    if not candidates:
+        return {}
+    candidates = list(candidates)
 
-                if len(anywhere) == 1:
-                    prefixes[p]['advice'] = "Looks good: in BGP consistent origin AS in route-objects"
-                    prefixes[p]['label'] = "success"
-                else:
-                    prefixes[p]['advice'] = "Multiple route-object exist with different origins"
-                    prefixes[p]['label'] = 'warning'
+    bgp_origins = other_query("BGP", "search_exact_many", candidates)
+    irr_origins = irr_query("search_exact_many", candidates)
 
+    prefixes = {}
+    for p in candidates:
+        prefixes[p] = {'bgp_origin': False}
+        if p in bgp_origins:
+            prefixes[p]['bgp_origin'] = bgp_origins[p]['origins']
+        for db in irr_origins:
+            if p in irr_origins[db]:
+                prefixes[p][db] = irr_origins[db][p]['origins']
             else:
-                prefixes[p]['advice'] = "Prefix in DFZ, but no route-object with correct origin anywhere"
-                prefixes[p]['label'] = "danger"
-
-        else: # not ripe managed, no bgp origin
-            prefixes[p]['advice'] = "Not seen in BGP, but (legacy?) route-objects exist, consider clean-up"
-            prefixes[p]['label'] = "warning"
-
-
-    prefixes, msg = prefix_post_process(prefixes)
-    print msg # have to get this into the web page as well...
+                prefixes[p][db] = False
 
+    prefixes = classify_prefixes(prefixes)
 
     t_delta = time.time() - t_start
-    print
-    print 'Time for prefix report for %s: %f' % (prefix, t_delta)
-    print
+    print 'Time for autnum report for AS%i: %f' % (asn, t_delta)
 
     return prefixes
 
@@ -529,16 +891,27 @@ def create_app(configfile=None):
                 flash('Just one field is required, fill it in!')
                 return redirect(url_for('prefix_search', prefix=data))
 
-#FIXME no support for as-set digging for now
-#            elif data.startswith('AS'):
-#                return redirect(url_for('asset', asset=data))
+            elif data.upper().startswith('AS'):
+                return redirect(url_for('asset', asset=data))
 
             else:
                 return render_template('index.html', form=form)
 
     @app.route('/autnum/<autnum>')
     def autnum(autnum):
-        return str(irr_query("inverseasn", autnum))
+        try:
+            asn = utils.parse_autnum(autnum)
+        except ValueError:
+            msg = 'Could not parse input %s as autnum' % autnum
+            print msg
+            abort(400, msg)
+        try:
+            headers = loading_headers()
+            return Response(json.dumps(autnum_report(asn)), headers=headers)
+        except Exception as e:
+            msg = 'Error processing autnum %s: %s' % (autnum, str(e))
+            print msg
+            abort(500, msg)
 
     @app.route('/prefix/<path:prefix>')
     @app.route('/prefix/', defaults={'prefix': None})
@@ -561,8 +934,9 @@ def create_app(configfile=None):
             print msg
             abort(400, msg)
         try:
-            prefix_data = prefix_report(prefix)
-            return json.dumps(prefix_data)
+            prefix_data, missing = prefix_report(prefix)
+            headers = loading_headers(missing)
+            return Response(json.dumps(prefix_data), headers=headers)
         except NoPrefixError as e:
             print e
             abort(400, str(e))
@@ -583,8 +957,9 @@ def create_app(configfile=None):
             abort(400, msg)
 
         try:
-            prefix_data = prefix_report(prefix, exact=True)
-            return json.dumps(prefix_data)
+            prefix_data, missing = prefix_report(prefix, exact=True)
+            headers = loading_headers(missing)
+            return Response(json.dumps(prefix_data), headers=headers)
         except NoPrefixError as e:
             print e
             abort(400, str(e))
@@ -594,10 +969,86 @@ def create_app(configfile=None):
             print msg
             abort(500, msg)
 
+    @app.route('/status')
+    def status():
+        """
+        Load state of every data source: loading or ready, the number of
+        objects applied so far and the serial it is at
+        """
+        sources = OrderedDict((name, s.to_dict())
+                              for name, s in load_statuses.items())
+        return Response(json.dumps({'ready': not loading_sources(),
+                                    'sources': sources}),
+                        mimetype='application/json')
+
+    @app.route('/jobs/prefix_report', methods=['POST'])
+    def submit_prefix_report():
+        """
+        Start a prefix report in the background, takes prefix and optional
+        exact from a form or JSON body and returns the job id to poll.
+        """
+        data = request.get_json(force=True, silent=True) or request.form
+        prefix = data.get('prefix', '')
+        exact = data.get('exact') in (True, 'true', '1')
+        try:
+            ipaddr.IPNetwork(prefix)
+        except ValueError:
+            msg = 'Could not parse input %s as prefix' % prefix
+            print msg
+            abort(400, msg)
+        try:
+            job = job_pool.submit(prefix_report_job, str(prefix), exact)
+        except jobs.JobPoolFull as e:
+            return Response(json.dumps({'error': str(e)}), status=503,
+                            mimetype='application/json',
+                            headers={'Retry-After': '5'})
+        return Response(json.dumps({'id': job.id, 'state': job.state}),
+                        status=202, mimetype='application/json')
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        """
+        State of a job, with the partial results per source unless
+        ?partial=0 is given, and the result once it is done
+        """
+        job = job_pool.get(job_id)
+        if job is None:
+            abort(404, 'No such job %s' % job_id)
+        partial = request.args.get('partial', '1') != '0'
+        return Response(json.dumps(job.to_dict(partial)),
+                        mimetype='application/json')
+
+    @app.route('/bulk_prefix_json', methods=['POST'])
+    def bulk_prefix_json():
+        """
+        Takes a JSON list of prefixes, or one prefix per line, and streams
+        back one JSON object per prefix (NDJSON).
+        """
+        prefixes = request.get_json(force=True, silent=True)
+        if prefixes is None:
+            prefixes = request.get_data().split()
+        if not isinstance(prefixes, list) or \
+                not all(isinstance(p, basestring) for p in prefixes):
+            abort(400, 'Expected a list of prefixes')
+        if len(prefixes) > MAX_BULK_PREFIXES:
+            abort(400, 'At most %i prefixes per request' % MAX_BULK_PREFIXES)
+        prefixes = [str(p.strip()) for p in prefixes if p.strip()]
+
+        def generate():
+            for result in bulk_prefix_report(prefixes):
+                yield json.dumps(result) + '\n'
 
-#    @app.route('/asset/<asset>')
-#    def asset(asset):
-#        return str(utils.lookup_assets(asset))
+        return Response(generate(), mimetype='application/x-ndjson')
+
+
+    @app.route('/asset/<asset>')
+    def asset(asset):
+        try:
+            return json.dumps(asset_expander.expand(asset))
+        except Exception as e:
+            msg = 'Error expanding as-set %s: %s' % (asset, str(e))
+            print msg
+            abort(500, msg)
 
     return app
 
@@ -13,4 +13,8 @@ class config(object):
     def __init__(self, cfgfile):
         data = yaml.load(open(cfgfile))
         self.databases = data['databases']
+        self.index_dir = data.get('index_dir')
+        self.snapshot_dir = data.get('snapshot_dir')
+        self.exabgp_source = data.get('exabgp_source')
+        self.consolidated = data.get('consolidated', False)
 
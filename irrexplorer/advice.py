@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Advice on the registration of a prefix
+
+    Each prefix is reduced to a handful of facts, bits in an int, about its
+    BGP origin and the route objects for it. The route objects come as
+    origin -> bitset of the IRR databases with a route object for that
+    origin. RULES is evaluated once for every combination of facts, so
+    classifying a prefix is a table lookup.
+"""
+
+DATABASES = ['afrinic', 'altdb', 'apnic', 'arin', 'bboi', 'bell', 'gt',
+             'jpirr', 'level3', 'nttcom', 'radb', 'rgnet', 'savvis', 'tc',
+             'ripe']
+DATABASE_BITS = dict((db, 1 << i) for i, db in enumerate(DATABASES))
+RIPE = DATABASE_BITS['ripe']
+
+# facts
+MANAGED = 1 << 0             # RIPE managed address space
+IN_BGP = 1 << 1              # seen in BGP
+IN_RIPE = 1 << 2             # has a route object in the RIPE DB
+BGP_IN_RIPE = 1 << 3         # ... for the BGP origin
+BGP_IN_FOREIGN = 1 << 4      # a route object for the BGP origin elsewhere
+BGP_REGISTERED = 1 << 5      # a route object for the BGP origin anywhere
+SINGLE_ORIGIN = 1 << 6       # route objects for one origin only
+FOREIGN_ONLY_BGP = 1 << 7    # route objects elsewhere are all for the BGP origin
+FACTS = 8
+
+# (facts that matter, their required value, advice, label), first match wins
+RULES = [
+    (MANAGED | BGP_IN_RIPE | SINGLE_ORIGIN | BGP_IN_FOREIGN,
+     MANAGED | BGP_IN_RIPE | SINGLE_ORIGIN,
+     "Perfect", "success"),
+    (MANAGED | BGP_IN_RIPE | FOREIGN_ONLY_BGP,
+     MANAGED | BGP_IN_RIPE | FOREIGN_ONLY_BGP,
+     "Proper RIPE DB object, but foreign or proxy objects also exist",
+     "warning"),
+    (MANAGED | BGP_IN_RIPE | BGP_IN_FOREIGN,
+     MANAGED | BGP_IN_RIPE | BGP_IN_FOREIGN,
+     "Proper RIPE DB object, but foreign objects also exist, consider removing these",
+     "warning"),
+    (MANAGED | BGP_IN_RIPE, MANAGED | BGP_IN_RIPE,
+     "Looks good, but multiple entries exists in RIPE DB", "success"),
+    (MANAGED | IN_RIPE | IN_BGP, MANAGED | IN_RIPE | IN_BGP,
+     "Prefix is in DFZ, but registered with wrong origin in RIPE!", "danger"),
+    (MANAGED | IN_RIPE, MANAGED | IN_RIPE,
+     "Not seen in BGP, but (legacy?) route-objects exist, consider clean-up",
+     "warning"),
+    (MANAGED | IN_BGP, MANAGED | IN_BGP,
+     "Prefix is in DFZ, but NOT registered in RIPE!", "danger"),
+    (MANAGED, MANAGED,
+     "Route objects in foreign registries exist, consider moving them to RIPE DB",
+     "warning"),
+    (IN_BGP | BGP_REGISTERED | SINGLE_ORIGIN,
+     IN_BGP | BGP_REGISTERED | SINGLE_ORIGIN,
+     "Looks good: in BGP consistent origin AS in route-objects", "success"),
+    (IN_BGP | BGP_REGISTERED, IN_BGP | BGP_REGISTERED,
+     "Multiple route-object exist with different origins", "warning"),
+    (IN_BGP, IN_BGP,
+     "Prefix in DFZ, but no route-object with correct origin anywhere",
+     "danger"),
+    (0, 0,
+     "Not seen in BGP, but (legacy?) route-objects exist, consider clean-up",
+     "warning"),
+]
+
+# (advice, label) for a prefix in neither BGP nor any IRR database
+NOT_FOUND = ("Not seen in BGP and no route-objects", "default")
+
+
+def _build_table():
+    table = []
+    for facts in range(1 << FACTS):
+        for mask, value, advice, label in RULES:
+            if facts & mask == value:
+                table.append((advice, label))
+                break
+    return table
+
+TABLE = _build_table()
+
+
+def origin_bitsets(row):
+    """
+    Args:
+        row (dict): report row, IRR database -> list of origins or False
+
+    Returns:
+        dict origin -> bitset of the databases with a route object for it
+    """
+    bitsets = {}
+    for db, bit in DATABASE_BITS.items():
+        origins = row.get(db)
+        if origins:
+            for origin in origins:
+                bitsets[origin] = bitsets.get(origin, 0) | bit
+    return bitsets
+
+
+def facts(bgp_origin, ripe_managed, bitsets):
+    """ the facts bits for one prefix """
+    result = 0
+    if ripe_managed:
+        result |= MANAGED
+    if len(bitsets) == 1:
+        result |= SINGLE_ORIGIN
+    foreign = set(o for o, dbs in bitsets.items() if dbs & ~RIPE)
+    if any(dbs & RIPE for dbs in bitsets.values()):
+        result |= IN_RIPE
+    if bgp_origin:
+        result |= IN_BGP
+        dbs = bitsets.get(bgp_origin, 0)
+        if dbs:
+            result |= BGP_REGISTERED
+        if dbs & RIPE:
+            result |= BGP_IN_RIPE
+        if dbs & ~RIPE:
+            result |= BGP_IN_FOREIGN
+        if foreign == set([bgp_origin]):
+            result |= FOREIGN_ONLY_BGP
+    return result
+
+
+def classify(bgp_origin, ripe_managed, bitsets):
+    """
+    Returns:
+        (advice, label) tuple
+    """
+    return TABLE[facts(bgp_origin, ripe_managed, bitsets)]
+
+
+def classify_rows(rows):
+    """
+    Set 'advice' and 'label' on report rows which carry 'bgp_origin',
+    'ripe_managed' and the origins per IRR database
+    """
+    for row in rows:
+        row['advice'], row['label'] = classify(
+            row['bgp_origin'], row['ripe_managed'], origin_bitsets(row))
+
+
+def not_found_row(report, ripe_managed):
+    """
+    Report row for a prefix in neither BGP nor any IRR database, with a
+    blank for every database in report
+    """
+    row = {'bgp_origin': False, 'ripe_managed': ripe_managed}
+    for other in report.values():
+        for db in other:
+            if db in DATABASES:
+                row[db] = "-"
+    row['advice'], row['label'] = NOT_FOUND
+    return row
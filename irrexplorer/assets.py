@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Recursive as-set expansion
+
+    Members of as-sets are looked up in all IRR databases at once, one
+    batch per level of nesting, and memoized. Expansions are cached until
+    one of the as-sets they were built from changes over NRTM. Answers
+    which some databases missed are used once, but not memoized.
+"""
+
+import threading
+from collections import OrderedDict
+
+from irrexplorer import cache
+
+EXPANSION_CACHE_SIZE = 1000  # expanded as-sets
+MEMBERS_CACHE_SIZE = 10000  # as-sets with their members
+
+
+def is_autnum(member):
+    return member[:2] == 'AS' and member[2:].isdigit()
+
+
+class ASSetExpander(object):
+    """
+    fetch(names) is asked for the members of a list of as-sets and returns
+    {database: {name: members}} for the databases that answered.
+    complete(databases) tells whether an answer from these databases is
+    complete enough to memoize, by default every answer is. Names which no
+    database knows are not memoized.
+    """
+
+    def __init__(self, fetch, size=EXPANSION_CACHE_SIZE, complete=None,
+                 members_size=MEMBERS_CACHE_SIZE):
+        self.fetch = fetch
+        self.size = size
+        self.complete = complete
+        self.members_size = members_size
+        self.members = OrderedDict()  # name -> {database: members}
+        self.expansions = OrderedDict()  # name -> (expansion, sets used)
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def expand(self, name):
+        """
+        Returns:
+            dict with the 'autnums' in the as-set and all nested sets, the
+            'sets' that were visited and the 'unresolved' sets which are in
+            none of the databases. Expansions are shared, do not modify.
+        """
+        name = name.upper()
+        with self.lock:
+            entry = self.expansions.pop(name, None)
+            if entry is not None:
+                self.expansions[name] = entry
+                return entry[0]
+            generation = self.generation
+
+        autnums = set()
+        unresolved = set()
+        seen = set([name])
+        level = [name]
+        memoize = True
+        while level:
+            members, complete = self._members(level)
+            memoize = memoize and complete
+            next_level = []
+            for asset in level:
+                if not members[asset]:
+                    unresolved.add(asset)
+                    continue
+                for dbmembers in members[asset].values():
+                    for member in dbmembers:
+                        if is_autnum(member):
+                            autnums.add(member)
+                        elif member not in seen:
+                            # sets already seen are not followed again,
+                            # which also ends loops between as-sets
+                            seen.add(member)
+                            next_level.append(member)
+            level = next_level
+
+        expansion = {
+            'autnums': sorted(autnums, key=lambda a: int(a[2:])),
+            'sets': sorted(seen),
+            'unresolved': sorted(unresolved),
+        }
+        with self.lock:
+            if memoize and generation == self.generation:
+                self.expansions[name] = (expansion, seen)
+                while len(self.expansions) > self.size:
+                    self.expansions.popitem(last=False)
+        return expansion
+
+    def _members(self, names):
+        """
+        Memoized members of names, fetching the unknown ones at once
+
+        Returns:
+            members per name, and whether they all came from complete answers
+        """
+        with self.lock:
+            generation = self.generation
+            found = {}
+            for n in names:
+                members = self.members.pop(n, None)
+                if members is not None:
+                    self.members[n] = members
+                    found[n] = members
+        missing = [n for n in names if n not in found]
+        if not missing:
+            return found, True
+
+        fetched = dict((n, {}) for n in missing)
+        answer = self.fetch(missing)
+        for database, result in answer.items():
+            for asset, members in result.items():
+                fetched[asset][database] = members
+        complete = self.complete is None or self.complete(list(answer))
+        with self.lock:
+            if complete and generation == self.generation:
+                for asset, members in fetched.items():
+                    if members:
+                        self.members[asset] = members
+                while len(self.members) > self.members_size:
+                    self.members.popitem(last=False)
+        found.update(fetched)
+        return found, complete
+
+    def invalidate(self, names):
+        """
+        Forget the changed as-sets and every expansion built from them, or
+        everything when names is FLUSH_ALL
+        """
+        with self.lock:
+            self.generation += 1
+            if names is cache.FLUSH_ALL:
+                self.members.clear()
+                self.expansions.clear()
+                return
+            names = set(n.upper() for n in names)
+            for asset in names:
+                self.members.pop(asset, None)
+            for asset, (expansion, used) in self.expansions.items():
+                if not used.isdisjoint(names):
+                    del self.expansions[asset]
+
+    def follow(self, change_queue):
+        """ Start a thread applying the as-set changes of the workers """
+        def listen():
+            while True:
+                source, names = change_queue.get()
+                self.invalidate(names)
+
+        t = threading.Thread(target=listen)
+        t.setDaemon(True)
+        t.start()
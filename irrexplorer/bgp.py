@@ -25,7 +25,15 @@
 # ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+from irrexplorer import prefixindex
+from irrexplorer import bgpfeed
+from irrexplorer import cache
+from irrexplorer import irrdb
+from irrexplorer import rwlock
+from irrexplorer import status as load_status
+
 import radix
+import socket
 import time
 import urllib2
 import threading
@@ -37,6 +45,30 @@ DEFAULT_BGP_SOURCE = "http://lg01.infra.ring.nlnog.net/table.txt"
 
 UPDATE_INTERVAL = 300 # seconds
 
+FEED_RECONNECT_INTERVAL = 10 # seconds
+
+# changes applied per hold of the write lock during a table refresh
+APPLY_BATCH = 1000
+
+
+def prefixset(prefix_keys, target):
+    """
+    Args:
+        prefix_keys (set): packed keys of the prefixes in the table
+        target (iterable): prefixes to check
+
+    Returns:
+        set of the target prefixes that are in the table
+    """
+    result = set()
+    for prefix in target:
+        try:
+            if prefixindex.pack_prefix(prefix) in prefix_keys:
+                result.add(prefix)
+        except ValueError:
+            continue
+    return result
+
 
 
 class BGPClient(object):
@@ -45,30 +77,33 @@ class BGPClient(object):
         self.bgp_source = bgp_source
 
 
-    def fetch_table(self):
+    def open_table(self):
         if self.bgp_source.startswith('http://') or self.bgp_source.startswith('https://'):
             req = urllib2.Request(self.bgp_source)
-            response = urllib2.urlopen(req)
-            return response.read()
+            return urllib2.urlopen(req)
         else:
             # probably a file
-            return open(self.bgp_source).read()
+            return open(self.bgp_source)
 
     def get(self):
-        prefixes = []
-        table_data = self.fetch_table()
-        for line in table_data.split('\n'):
+        """
+        Generate (prefix, origin) tuples while the table is being read, the
+        table is never held in memory as a whole.
+        """
+        count = 0
+        for line in self.open_table():
             line = line.strip()
             if not line:
                 continue
             try:
-                prefix, origin = line.strip().split(' ')
+                prefix, origin = line.split(' ')
                 origin = int(origin)
-            except Exception as e:
+            except ValueError as e:
                 print 'BGP line parse error:', e, line
-            prefixes.append((prefix, origin))
-        print "INFO: Collected all prefixes, %i elements" % len(prefixes)
-        return prefixes
+                continue
+            count += 1
+            yield prefix, origin
+        print "INFO: Collected all prefixes, %i elements" % count
 
 
 class BGPLookupWorker(threading.Thread):
@@ -77,70 +112,82 @@ class BGPLookupWorker(threading.Thread):
     to merge this into the IRR lookup worker at some point.
     """
 
-    def __init__(self, tree, prefixes, asn_prefix_map, lookup_queue,
-                 result_queue):
+    def __init__(self, tree, prefix_keys, asn_prefix_map, lookup_queue,
+                 result_queue, lock=None):
         threading.Thread.__init__(self)
+        if lock is None:
+            lock = rwlock.ReadWriteLock()
+        self.lock = lock
         self.tree = tree
-        self.prefixes = prefixes
+        self.prefix_keys = prefix_keys
         self.asn_prefix_map = asn_prefix_map
         self.lookup_queue = lookup_queue
         self.result_queue = result_queue
 
     def run(self):
         while True:
-            lookup, target = self.lookup_queue.get()
+            request_id, lookup, target = self.lookup_queue.get()
             results = {}
             if not lookup:
                 continue
-            else:
-                print "received BGP lookup: %s %s" % (lookup, target)
-
-            if lookup == "search_specifics":
-                data = None
-                for rnode in self.tree.search_covered(target):
-                    prefix = rnode.prefix
-                    origins = rnode.data['origins']
-                    results[prefix] = {}
-                    results[prefix]['origins'] = origins
-                self.result_queue.put(results)
-
-            elif lookup == "search_exact":
-                rnode = self.tree.search_exact(target)
-                if not rnode:
-                    self.result_queue.put({})
-                else:
-                    prefix = rnode.prefix
-                    origins = rnode.data['origins']
-                    results[prefix] = {}
-                    results[prefix]['origins'] = origins
-                    self.result_queue.put(results)
-
-            elif lookup == "search_aggregate":
-                try:
-                    rnode = self.tree.search_worst(target)
-                except ValueError:  # not a valid prefix
-                    rnode = None
-                if not rnode:
-                    self.result_queue.put(None)
-                else:
-                    prefix = rnode.prefix
-                    data = rnode.data
-                    self.result_queue.put((prefix, data))
-
-            elif lookup == "inverseasn":
-                if target in self.asn_prefix_map:
-                    self.result_queue.put(self.asn_prefix_map[target])
-                else:
-                    self.result_queue.put([])
-
-            elif lookup == "prefixset":
-                self.result_queue.put(set(target) & set(self.prefixes))
-
-            elif lookup == "exit":
-                self.result_queue.put("exit-confirm")
+
+            if lookup == "exit":
+                # no confirmation on the result queue, it is read by the
+                # dispatcher in the web process, BGPWorker joins instead
                 self.lookup_queue.task_done()
                 break
 
+            # the worker holds the write lock while it applies a batch of
+            # changes, a lookup never sees half of one
+            with self.lock.reading():
+                if lookup == "search_specifics":
+                    data = None
+                    for rnode in self.tree.search_covered(target):
+                        prefix = rnode.prefix
+                        origins = rnode.data['origins']
+                        results[prefix] = {}
+                        results[prefix]['origins'] = origins
+                    self.result_queue.put((request_id, results))
+
+                elif lookup == "search_exact":
+                    rnode = self.tree.search_exact(target)
+                    if not rnode:
+                        self.result_queue.put((request_id, {}))
+                    else:
+                        prefix = rnode.prefix
+                        origins = rnode.data['origins']
+                        results[prefix] = {}
+                        results[prefix]['origins'] = origins
+                        self.result_queue.put((request_id, results))
+
+                elif lookup == "search_exact_many":
+                    for prefix in target:
+                        rnode = self.tree.search_exact(prefix)
+                        if rnode:
+                            results[rnode.prefix] = {'origins': rnode.data['origins']}
+                    self.result_queue.put((request_id, results))
+
+                elif lookup == "search_aggregate":
+                    try:
+                        rnode = self.tree.search_worst(target)
+                    except ValueError:  # not a valid prefix
+                        rnode = None
+                    if not rnode:
+                        self.result_queue.put((request_id, None))
+                    else:
+                        prefix = rnode.prefix
+                        data = dict(rnode.data)
+                        self.result_queue.put((request_id, (prefix, data)))
+
+                elif lookup == "inverseasn":
+                    if target in self.asn_prefix_map:
+                        self.result_queue.put((request_id, set(self.asn_prefix_map[target])))
+                    else:
+                        self.result_queue.put((request_id, []))
+
+                elif lookup == "prefixset":
+                    self.result_queue.put((request_id, prefixset(self.prefix_keys, target)))
+
             self.lookup_queue.task_done()
 
 
@@ -148,7 +195,9 @@ class BGPWorker(multiprocessing.Process):
     """
     Launch bgpclient() instance, provide a lookup thread
     """
-    def __init__(self, lookup_queue, result_queue, bgp_source=DEFAULT_BGP_SOURCE):
+    def __init__(self, lookup_queue, result_queue, bgp_source=DEFAULT_BGP_SOURCE,
+                 index_path=None, exabgp_source=None, change_queue=None,
+                 status=None):
 
         multiprocessing.Process.__init__(self)
 
@@ -157,51 +206,284 @@ class BGPWorker(multiprocessing.Process):
 
         self.bgp_client = BGPClient(bgp_source)
         self.tree = radix.Radix()
-        self.prefixes = []
+        self.prefixes = {}  # prefix -> origins, the table as last applied
+        self.route_peers = {}  # prefix -> {ExaBGP peer: origin}
+        self.prefix_keys = set()  # packed prefixes, for prefixset lookups
         self.asn_prefix_map = {}
+        self.origin_table = irrdb.OriginTable()
+        self.lock = rwlock.ReadWriteLock()
         self.dbname = "BGP"
-        self.ready_event = multiprocessing.Event()
+        if status is None:
+            status = load_status.LoadStatus(self.dbname)
+        self.status = status
+        self.ready_event = status.ready_event
+        self.index_path = index_path
+        if index_path:
+            prefixindex.remove_index(index_path)
+        self.last_delta = None
+        self.exabgp_source = exabgp_source
+        self.publisher = None
+        self.notifier = None
+        if change_queue is not None:
+            self.notifier = cache.ChangeNotifier(change_queue, self.dbname)
 
         self.lookup_worker = None
 
 
-    def updateTree(self):
+    def set_origins(self, prefix, origins):
+        """
+        Set the origins prefix is announced with, no origins withdraws it.
+        The ASN map has the prefix under each origin, the tree node carries
+        the lowest one.
+
+        Args:
+            prefix (str): the prefix
+            origins (tuple): sorted origin ASNs, from the origin table
+        """
+        old_origins = self.prefixes.get(prefix, ())
+        for origin in old_origins:
+            if origin not in origins:
+                self.withdraw_asn(prefix, origin)
+        if not origins:
+            del self.prefixes[prefix]
+            self.route_peers.pop(prefix, None)
+            self.tree.delete(prefix)
+            self.prefix_keys.discard(prefixindex.pack_prefix(prefix))
+        else:
+            if old_origins:
+                rnode = self.tree.search_exact(prefix)
+            else:
+                rnode = self.tree.add(prefix)
+                self.prefix_keys.add(prefixindex.pack_prefix(prefix))
+            rnode.data['origins'] = origins[0]
+            self.prefixes[prefix] = origins
+            for origin in origins:
+                self.asn_prefix_map.setdefault(origin, set()).add(prefix)
+        self.status.set_objects(len(self.prefixes))
+        if self.notifier:
+            self.notifier.changed(prefix)
+
+    def withdraw_asn(self, prefix, origin):
+        prefixes = self.asn_prefix_map[origin]
+        prefixes.discard(prefix)
+        if not prefixes:
+            del self.asn_prefix_map[origin]
+
+    def apply_table(self, table):
+        """
+        Bring the tree in line with a freshly fetched table, changing only
+        the prefixes that were announced, withdrawn or changed origins.
+        The origins of each prefix are collected from the whole table
+        first, a prefix may be announced by more than one AS and be listed
+        more than once. The changes are then applied in batches of
+        APPLY_BATCH under the write lock, the table is read without it.
+
+        Args:
+            table (iterable): (prefix, origin) tuples, read only once
+
+        Returns:
+            dict with the number of announced, withdrawn and changed prefixes
+        """
+        table_origins = {}
+        for prefix, origin in table:
+            try:
+                # keyed the way the tree writes the prefix, like irrdb
+                prefix = intern(prefixindex.normalize_prefix(prefix))
+            except ValueError as e:
+                print 'BGP table:', e
+                continue
+            origins = table_origins.get(prefix, ())
+            if origin not in origins:
+                table_origins[prefix] = self.origin_table.origins(
+                    sorted(origins + (self.origin_table.asn(origin),)))
+
+        delta = {'announced': 0, 'withdrawn': 0, 'changed': 0}
+        batch = []
+        for prefix, origins in table_origins.iteritems():
+            old_origins = self.prefixes.get(prefix)
+            if old_origins == origins:
+                continue
+            delta['changed' if old_origins else 'announced'] += 1
+            batch.append((prefix, origins))
+            if len(batch) >= APPLY_BATCH:
+                self.apply_batch(batch)
+                batch = []
+        for prefix in [p for p in self.prefixes if p not in table_origins]:
+            batch.append((prefix, ()))
+            delta['withdrawn'] += 1
+            if len(batch) >= APPLY_BATCH:
+                self.apply_batch(batch)
+                batch = []
+        self.apply_batch(batch)
+        return delta
+
+    def apply_batch(self, batch):
+        """ apply (prefix, origins) changes, no origins is a withdrawal """
+        with self.lock.writing():
+            for prefix, origins in batch:
+                self.set_origins(prefix, origins)
+
+    def update_peer(self, prefix, peer, origin):
+        """
+        Record the route peer has for prefix, origin None withdraws it. The
+        prefix carries the origins of all peers and is withdrawn once none
+        of them has a route for it left.
+
+        Returns:
+            True if the tree changed
+        """
+        prefix = intern(prefixindex.normalize_prefix(prefix))
+        peers = dict(self.route_peers.get(prefix, {}))
+        if origin is None:
+            if peers.pop(peer, None) is None:
+                return False
+        else:
+            origin = self.origin_table.asn(origin)
+            if peers.get(peer) == origin:
+                return False
+            peers[peer] = origin
+        origins = self.origin_table.origins(sorted(set(peers.values())))
+        changed = origins != self.prefixes.get(prefix, ())
+        if changed:
+            self.set_origins(prefix, origins)
+        if peers:
+            self.route_peers[prefix] = peers
+        return changed
+
+    def apply_change(self, action, prefix, origin, peer=None):
+        """
+        Apply a single announcement or withdrawal from a live feed
+
+        Returns:
+            True if the tree changed
+        """
+        if action != 'announce':
+            origin = None
+        with self.lock.writing():
+            try:
+                return self.update_peer(prefix, peer, origin)
+            except ValueError:
+                print 'BGP feed: not a valid prefix', prefix
+                return False
+
+    def flush_peer(self, peer):
+        """
+        Withdraw the routes announced by peer
+
+        Returns:
+            True if the tree changed
+        """
+        prefixes = [prefix for prefix, peers in self.route_peers.items()
+                    if peer in peers]
+        changed = False
+        for i in range(0, len(prefixes), APPLY_BATCH):
+            with self.lock.writing():
+                for prefix in prefixes[i:i + APPLY_BATCH]:
+                    changed = self.update_peer(prefix, peer, None) or changed
+        return changed
+
+    def flush_feed(self):
+        """
+        Withdraw all routes after losing the feed, they are announced again
+        once it is back. Until then the table is loading.
+        """
+        self.status.set_loading()
+        prefixes = list(self.prefixes)
+        for i in range(0, len(prefixes), APPLY_BATCH):
+            self.apply_batch([(prefix, ())
+                              for prefix in prefixes[i:i + APPLY_BATCH]])
+        if prefixes and self.publisher:
+            self.publisher.mark_dirty()
+
+    def follow_feed(self, feed):
+        """
+        Apply the changes from feed. The table is ready after the first
+        update or end-of-RIB, a peer going down takes its routes along.
+        """
+        for action, peer, prefix, origin in feed.get():
+            if action == 'down':
+                print "INFO: ExaBGP peer %s down, flushing its routes" % peer
+                changed = self.flush_peer(peer)
+            elif action == 'eor':
+                changed = False
+            else:
+                changed = self.apply_change(action, prefix, origin, peer)
+            if action != 'down' and not self.status.is_ready():
+                self.status.set_ready()
+            if changed and self.publisher:
+                self.publisher.mark_dirty()
+
+    def run_live(self):
+        """
+        Keep the tree up to date from ExaBGP instead of polling a table
+        """
+        self.lookup_worker = BGPLookupWorker(self.tree, self.prefix_keys, self.asn_prefix_map, self.lookup_queue, self.result_queue, self.lock)
+        self.lookup_worker.daemon = True
+        self.lookup_worker.start()
+
+        if self.index_path:
+            self.publisher = prefixindex.IndexPublisher(self.tree,
+                                                        self.index_path,
+                                                        single_origin=True,
+                                                        notifier=self.notifier,
+                                                        ready_event=self.ready_event,
+                                                        lock=self.lock)
+            self.publisher.daemon = True
+            self.publisher.start()
+        elif self.notifier:
+            self.notifier.daemon = True
+            self.notifier.start()
+
+        print "INFO: following ExaBGP feed %s" % self.exabgp_source
+        while True:
+            try:
+                self.follow_feed(bgpfeed.ExaBGPFeed(self.exabgp_source))
+            except (IOError, OSError, socket.error) as e:
+                print 'ERROR: ExaBGP feed %s: %s' % (self.exabgp_source, e)
+            # routes withdrawn while the feed was gone would stay forever
+            self.flush_feed()
+            time.sleep(FEED_RECONNECT_INTERVAL)
 
-        new_tree = radix.Radix()
-        new_asn_prefix_map = {}
-        new_prefixes = []
+    def updateTree(self):
 
         t_start = time.time()
-        for prefix, origin in self.bgp_client.get():
-            rnode = new_tree.add(prefix)
-            rnode.data['origins'] = origin
-            new_prefixes.append(prefix)
-            new_asn_prefix_map.setdefault(origin, []).append(prefix)
+        self.last_delta = self.apply_table(self.bgp_client.get())
+        print 'BGP table fetch and tree update time', round(time.time() - t_start, 2)
+        print 'BGP table delta: %(announced)i announced, %(withdrawn)i ' \
+            'withdrawn, %(changed)i changed origin' % self.last_delta
+
+        if self.index_path and any(self.last_delta.values()):
+            changes = self.notifier.take() if self.notifier else None
+            t_start = time.time()
+            with self.lock.reading():
+                entries = list(prefixindex.tree_entries(self.tree, True))
+            prefixindex.write_index(self.index_path, entries,
+                                    single_origin=True)
+            print 'BGP prefix index publish time', round(time.time() - t_start, 2)
+            if self.notifier:
+                self.notifier.send(changes)
 
-        print 'BGP tree update time', round(time.time() - t_start, 2)
 
-        self.tree = new_tree
-        self.asn_prefix_map = new_asn_prefix_map
-        self.prefixes = new_prefixes
+    def run(self):
 
+        if self.exabgp_source:
+            self.run_live()
+            return
 
-    def run(self):
+        if self.notifier and not self.index_path:
+            self.notifier.daemon = True
+            self.notifier.start()
+
+        # the tree is updated in place, one lookup thread will do, it
+        # answers from the partial tree while the first table loads
+        self.lookup_worker = BGPLookupWorker(self.tree, self.prefix_keys, self.asn_prefix_map, self.lookup_queue, self.result_queue, self.lock)
+        self.lookup_worker.daemon = True
+        self.lookup_worker.start()
 
         while True:
 
             self.updateTree()
 
-            if self.lookup_worker:
-                # let current lookup worker process current requests, and have it exit
-                self.lookup_queue.put(("exit", 1))
-                self.lookup_queue.join()
-                self.result_queue.get()
-
-            # start new lookup thread
-            self.lookup_worker = BGPLookupWorker(self.tree, self.prefixes, self.asn_prefix_map, self.lookup_queue, self.result_queue)
-            self.lookup_worker.daemon = True
-            self.lookup_worker.start()
-
             print "INFO: Loaded BGP tree"
             self.ready_event.set()
             time.sleep(UPDATE_INTERVAL)
@@ -215,12 +497,12 @@ if __name__ == "__main__":
     a.start()
     a.ready_event.wait()
 
-    lookup_queue.put(("prefixset", ["8.8.8.0/24", "4.0.0.0/8"]))
+    lookup_queue.put((1, "prefixset", ["8.8.8.0/24", "4.0.0.0/8"]))
     lookup_queue.join()
     print result_queue.get()
-    lookup_queue.put(("inverseasn", 15562))
+    lookup_queue.put((2, "inverseasn", 15562))
     lookup_queue.join()
     print result_queue.get()
-    lookup_queue.put(("search_specifics", "8.8.8.0/24"))
+    lookup_queue.put((3, "search_specifics", "8.8.8.0/24"))
     lookup_queue.join()
     print result_queue.get()
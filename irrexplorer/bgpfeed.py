@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Live BGP feed from ExaBGP
+
+    ExaBGP runs a process (see exabgp.conf) which relays its JSON encoded
+    messages to a unix socket. ExaBGPFeed reads these messages from the
+    socket, stdin or a file of recorded messages and turns the updates in
+    to announcements and withdrawals. End-of-RIB and peer down messages are
+    passed on as well.
+"""
+
+import json
+import os
+import socket
+import stat
+import sys
+
+
+def _prefixes(family_data):
+    """
+    ExaBGP 3.4 groups announcements per address family and next-hop, 3.3
+    only per next-hop. Family keys are the ones with a space in them, like
+    "ipv4 unicast".
+    """
+    for key, value in family_data.items():
+        if ' ' in key and isinstance(value, dict):
+            for prefix in _prefixes(value):
+                yield prefix
+        elif '/' in key:
+            yield key
+        elif isinstance(value, dict):
+            for prefix in value:
+                if '/' in prefix:
+                    yield prefix
+
+
+def _peer(neighbor):
+    """ ExaBGP 3.3 has the peer address in "ip", 3.4 in "address" """
+    address = neighbor.get('address')
+    if isinstance(address, dict):
+        return address.get('peer')
+    return neighbor.get('ip')
+
+
+def parse_message(line):
+    """
+    Args:
+        line (str): a single JSON message from ExaBGP
+
+    Returns:
+        list of (action, peer, prefix, origin) tuples, empty for anything
+        that is not an update, end-of-RIB or peer down. Actions are
+        'announce', 'withdraw' (origin None), 'eor' and 'down' (prefix and
+        origin None).
+    """
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return []
+    neighbor = message.get('neighbor')
+    if not isinstance(neighbor, dict):
+        return []
+    peer = _peer(neighbor)
+    if message.get('type') == 'state' or 'state' in neighbor:
+        if neighbor.get('state') == 'down':
+            return [('down', peer, None, None)]
+        return []
+    body = neighbor.get('message') or {}
+    update = neighbor.get('update') or body.get('update')
+    if 'eor' in body or (update and 'eor' in update):
+        return [('eor', peer, None, None)]
+    if not update:
+        return []
+
+    changes = []
+    for prefix in _prefixes(update.get('withdraw', {})):
+        changes.append(('withdraw', peer, str(prefix), None))
+
+    as_path = update.get('attribute', {}).get('as-path', [])
+    # the origin is the last AS in the path, skip paths ending in an AS_SET
+    origin = as_path[-1] if as_path else None
+    if isinstance(origin, (int, long)):
+        for prefix in _prefixes(update.get('announce', {})):
+            changes.append(('announce', peer, str(prefix), origin))
+    return changes
+
+
+class ExaBGPFeed(object):
+    """
+    Source of ExaBGP messages: "-" for stdin, a unix socket or a plain file
+    with one message per line.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def open(self):
+        if self.source == '-':
+            return sys.stdin
+        if stat.S_ISSOCK(os.stat(self.source).st_mode):
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.connect(self.source)
+            return s.makefile()
+        return open(self.source)
+
+    def get(self):
+        for line in self.open():
+            line = line.strip()
+            if not line:
+                continue
+            for change in parse_message(line):
+                yield change
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Cache for prefix reports
+
+    Reports are kept per (prefix, exact) for a limited time, least recently
+    used entries are evicted first. The workers report every prefix they
+    add or remove on a shared change queue, once the change is visible to
+    lookups. Every cached report whose aggregate overlaps a changed prefix
+    is dropped, so the cache never serves a report older than the data.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+import radix
+
+from irrexplorer import prefixindex
+
+CACHE_SIZE = 1000  # reports
+CACHE_TTL = 300  # seconds
+
+# a worker with more pending changes than this asks for a full flush
+MAX_CHANGES = 10000
+FLUSH_ALL = None
+NOTIFY_INTERVAL = 1  # seconds
+
+
+def covering_prefixes(prefix):
+    """ prefix and all its less specifics, least specific first """
+    family, network, prefixlen = prefixindex.prefix_to_key(prefix)
+    bits = prefixindex.BITS[family]
+    for length in range(prefixlen + 1):
+        masked = network & ~((1 << (bits - length)) - 1)
+        yield prefixindex.key_to_prefix(family, masked, length)
+
+
+class ReportCache(object):
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires, aggregate, report)
+        self.aggregates = radix.Radix()  # aggregate -> data['keys']
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, prefix, exact=False):
+        """
+        Returns:
+            the cached report, or None. Reports are shared, do not modify.
+        """
+        key = (prefix, exact)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._unlink(key, entry[1])
+                return None
+            self.entries[key] = entry
+            return entry[2]
+
+    def put(self, prefix, exact, aggregate, report, generation):
+        """
+        Store a report which was built on data aggregate covers. generation
+        is the value of self.generation from before the report was built,
+        the report is not stored if changes came in since then.
+        """
+        key = (prefix, exact)
+        with self.lock:
+            if generation != self.generation:
+                return
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self._unlink(key, old[1])
+            self.entries[key] = (time.time() + self.ttl, aggregate, report)
+            rnode = self.aggregates.search_exact(aggregate)
+            if not rnode:
+                rnode = self.aggregates.add(aggregate)
+                rnode.data['keys'] = set()
+            rnode.data['keys'].add(key)
+            while len(self.entries) > self.size:
+                old_key, old = self.entries.popitem(last=False)
+                self._unlink(old_key, old[1])
+
+    def report(self, prefix, exact, build, complete=True):
+        """
+        The cached report for (prefix, exact), or the one build() makes.
+        build returns (aggregate, report, missing IRR databases), a report
+        is only cached when it is complete and no database is missing.
+
+        Returns:
+            (report, the IRR databases missing from the report)
+        """
+        report = self.get(prefix, exact)
+        if report is not None:
+            return report, []
+        generation = self.generation
+        aggregate, report, missing = build()
+        if complete and not missing:
+            self.put(prefix, exact, aggregate, report, generation)
+        return report, missing
+
+    def _unlink(self, key, aggregate):
+        rnode = self.aggregates.search_exact(aggregate)
+        if rnode:
+            rnode.data['keys'].discard(key)
+            if not rnode.data['keys']:
+                self.aggregates.delete(aggregate)
+
+    def invalidate(self, prefixes):
+        """
+        Drop the reports overlapping any of the changed prefixes, or all
+        reports when prefixes is FLUSH_ALL
+        """
+        with self.lock:
+            self.generation += 1
+            if prefixes is FLUSH_ALL:
+                self.entries.clear()
+                self.aggregates = radix.Radix()
+                return
+            for prefix in prefixes:
+                try:
+                    rnodes = self.aggregates.search_covered(prefix)
+                    for covering in covering_prefixes(prefix):
+                        rnode = self.aggregates.search_exact(covering)
+                        if rnode:
+                            rnodes.append(rnode)
+                except ValueError:
+                    continue
+                for rnode in rnodes:
+                    for key in list(rnode.data['keys']):
+                        entry = self.entries.pop(key, None)
+                        if entry is not None:
+                            self._unlink(key, entry[1])
+
+    def follow(self, change_queue):
+        """ Start a thread applying the changes reported by the workers """
+        def listen():
+            while True:
+                source, prefixes = change_queue.get()
+                self.invalidate(prefixes)
+
+        t = threading.Thread(target=listen)
+        t.setDaemon(True)
+        t.start()
+
+
+class ChangeNotifier(threading.Thread):
+    """
+    Worker side: collects changed prefixes and puts them on the change
+    queue in batches. Workers publishing a prefix index take() the pending
+    changes before writing the index and send() them once it is in place,
+    others run the notifier as a thread which flushes every interval
+    seconds.
+    """
+
+    def __init__(self, change_queue, source, interval=NOTIFY_INTERVAL):
+        threading.Thread.__init__(self)
+        self.change_queue = change_queue
+        self.source = source
+        self.interval = interval
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def changed(self, prefix):
+        with self.lock:
+            if self.pending is FLUSH_ALL:
+                return
+            self.pending.add(prefix)
+            if len(self.pending) > MAX_CHANGES:
+                self.pending = FLUSH_ALL
+
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, set()
+        return pending
+
+    def send(self, pending):
+        if pending is FLUSH_ALL:
+            self.change_queue.put((self.source, FLUSH_ALL))
+        elif pending:
+            self.change_queue.put((self.source, list(pending)))
+
+    def flush(self):
+        self.send(self.take())
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
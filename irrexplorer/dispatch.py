@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Request/response dispatcher on top of the worker lookup queues
+
+    Every request gets its own id, which the lookup workers send back
+    together with the result. A collector thread per result queue hands the
+    results to the reply channel of the request that asked for them, so
+    concurrent callers never receive each other's answers.
+
+    Lookup queue items:  (request_id, query_type, target)
+    Result queue items:  (request_id, result)
+"""
+
+import itertools
+import threading
+import time
+import Queue
+
+QUERY_TIMEOUT = 30  # seconds
+
+
+class LookupTimeout(Exception):
+    pass
+
+
+class Dispatcher(object):
+
+    def __init__(self, lookup_queues, result_queues, timeout=QUERY_TIMEOUT):
+        self.lookup_queues = lookup_queues
+        self.result_queues = result_queues
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._collectors = []
+
+    def start(self):
+        for source, result_queue in self.result_queues.items():
+            collector = threading.Thread(target=self._collect,
+                                         args=(source, result_queue))
+            collector.setDaemon(True)
+            collector.start()
+            self._collectors.append(collector)
+
+    def _collect(self, source, result_queue):
+        while True:
+            request_id, result = result_queue.get()
+            with self._lock:
+                reply = self._pending.get(request_id)
+            if reply is None:
+                print "WARNING: dropping late %s answer for request %s" % \
+                    (source, request_id)
+                continue
+            reply.put((source, result))
+
+    def query(self, sources, query_type, target, timeout=None,
+              on_result=None):
+        """
+        Send a lookup to all sources at once and gather the answers.
+
+        Args:
+            sources (list): names of the lookup queues to ask
+            query_type (str): lookup understood by the workers
+            target: argument for the lookup
+            timeout (float): seconds to wait for the slowest source
+            on_result (callable): called with (source, result) for every
+                answer as it comes in
+
+        Returns:
+            dict with an entry per source that answered in time
+        """
+        if timeout is None:
+            timeout = self.timeout
+        reply = Queue.Queue()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = reply
+
+        try:
+            for source in sources:
+                self.lookup_queues[source].put((request_id, query_type,
+                                                target))
+            results = {}
+            deadline = time.time() + timeout
+            while len(results) < len(sources):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    source, result = reply.get(timeout=remaining)
+                except Queue.Empty:
+                    break
+                results[source] = result
+                if on_result is not None:
+                    on_result(source, result)
+        finally:
+            with self._lock:
+                del self._pending[request_id]
+
+        for source in sources:
+            if source not in results:
+                print "WARNING: %s did not answer %s %s within %i seconds" % \
+                    (source, query_type, target, timeout)
+        return results
+
+    def query_one(self, source, query_type, target, timeout=None):
+        """ Like query(), but raises LookupTimeout when source is silent """
+        results = self.query([source], query_type, target, timeout)
+        if source not in results:
+            raise LookupTimeout("%s did not answer %s for %s" %
+                                (source, query_type, target))
+        return results[source]
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    In-memory state of a single IRR database: a radix tree of route
+    objects, the inverse ASN map and the as-sets. MultiIRRDatabase keeps
+    the route objects of several databases in one tree.
+"""
+
+import radix
+
+from irrexplorer import cache
+
+
+class OriginTable(object):
+    """
+    Hands out one shared object per distinct ASN and per distinct tuple of
+    origins. Most prefixes have the same few origin sets, with millions of
+    route objects this saves a list (or boxed int) per tree node. Entries
+    are never dropped, the number of distinct origin sets stays small.
+    """
+
+    def __init__(self):
+        self.table = {}
+
+    def asn(self, asn):
+        return self.table.setdefault(asn, asn)
+
+    def origins(self, origins):
+        origins = tuple(origins)
+        return self.table.setdefault(origins, origins)
+
+
+class IRRDatabase(object):
+    """
+    The tree nodes carry data['origins'], a tuple of origin ASNs with a
+    route object for that prefix, shared through an OriginTable. A node
+    lives as long as it has origins left. The inverse ASN map holds a set
+    of prefixes per origin, so ADD and DEL are O(1) and a route object can
+    not be registered twice.
+
+    The origins tuple of a node is replaced, never changed in place, so a
+    lookup thread always sees either the old or the new tuple.
+    """
+
+    def __init__(self):
+        self.tree = radix.Radix()
+        self.asn_prefix_map = {}
+        self.assets = {}
+        self.origin_table = OriginTable()
+
+    def add_route(self, prefix, origin):
+        origin = self.origin_table.asn(origin)
+        rnode = self.tree.search_exact(prefix)
+        if not rnode:
+            # FIXME does sometimes fails in the pure python
+            # py-radix
+            rnode = self.tree.add(prefix)
+            rnode.data['origins'] = self.origin_table.origins((origin,))
+        elif origin not in rnode.data['origins']:
+            rnode.data['origins'] = self.origin_table.origins(
+                rnode.data['origins'] + (origin,))
+
+        # add prefix to the inverse ASN map, written the way the tree
+        # writes it, lookups answer with rnode.prefix
+        prefix = intern(rnode.prefix)
+        self.asn_prefix_map.setdefault(origin, set()).add(prefix)
+
+    def delete_route(self, prefix, origin):
+        """
+        Remove the route object for (prefix, origin). The tree node is only
+        deleted when no other origin has a route object for the prefix.
+
+        Raises:
+            KeyError if there is no such route object
+        """
+        rnode = self.tree.search_exact(prefix)
+        if not rnode or origin not in rnode.data['origins']:
+            raise KeyError((prefix, origin))
+        prefix = rnode.prefix
+        origins = tuple(o for o in rnode.data['origins'] if o != origin)
+        if origins:
+            rnode.data['origins'] = self.origin_table.origins(origins)
+        else:
+            self.tree.delete(prefix)
+
+        prefixes = self.asn_prefix_map.get(origin)
+        if prefixes is not None:
+            prefixes.discard(prefix)
+            if not prefixes:
+                del self.asn_prefix_map[origin]
+
+    def add_asset(self, name, members):
+        """ as-set names are case insensitive, they are kept upper case """
+        self.assets[name.upper()] = frozenset(m.upper() for m in members)
+
+    def delete_asset(self, name):
+        """
+        Raises:
+            KeyError if there is no such as-set
+        """
+        del self.assets[name.upper()]
+
+
+class MultiIRRDatabase(object):
+    """
+    The route objects of several IRR databases in a single radix tree, so
+    one walk of the tree answers for all of them. data['origins'] of a
+    node maps database id -> tuple of origin ASNs, the table is replaced
+    on every change like the origins list of IRRDatabase. The inverse ASN
+    maps and the as-sets are kept per database. The origin tuples are
+    shared through an OriginTable.
+
+    The lookups return {database name: result}, every result in the same
+    form the per database LookupWorker sends.
+    """
+
+    def __init__(self, dbnames):
+        self.tree = radix.Radix()
+        self.dbnames = list(dbnames)
+        self.asn_prefix_maps = [{} for _ in self.dbnames]
+        self.assets = [{} for _ in self.dbnames]
+        self.origin_table = OriginTable()
+
+    def database(self, dbname):
+        """ a view with the IRRDatabase update methods for one database """
+        return _DatabaseView(self, self.dbnames.index(dbname))
+
+    def add_route(self, db_id, prefix, origin):
+        origin = self.origin_table.asn(origin)
+        rnode = self.tree.search_exact(prefix)
+        if not rnode:
+            rnode = self.tree.add(prefix)
+            rnode.data['origins'] = {
+                db_id: self.origin_table.origins((origin,))}
+        else:
+            origins = rnode.data['origins'].get(db_id, ())
+            if origin not in origins:
+                table = dict(rnode.data['origins'])
+                table[db_id] = self.origin_table.origins(origins + (origin,))
+                rnode.data['origins'] = table
+
+        prefix = intern(rnode.prefix)
+        self.asn_prefix_maps[db_id].setdefault(origin, set()).add(prefix)
+
+    def delete_route(self, db_id, prefix, origin):
+        """
+        Raises:
+            KeyError if db_id has no such route object
+        """
+        rnode = self.tree.search_exact(prefix)
+        if not rnode or origin not in rnode.data['origins'].get(db_id, ()):
+            raise KeyError((prefix, origin))
+        prefix = rnode.prefix
+        table = dict(rnode.data['origins'])
+        origins = tuple(o for o in table[db_id] if o != origin)
+        if origins:
+            table[db_id] = self.origin_table.origins(origins)
+        else:
+            del table[db_id]
+        if table:
+            rnode.data['origins'] = table
+        else:
+            self.tree.delete(prefix)
+
+        prefixes = self.asn_prefix_maps[db_id].get(origin)
+        if prefixes is not None:
+            prefixes.discard(prefix)
+            if not prefixes:
+                del self.asn_prefix_maps[db_id][origin]
+
+    def _split(self, rnodes):
+        results = [{} for _ in self.dbnames]
+        for rnode in rnodes:
+            for db_id, origins in rnode.data['origins'].items():
+                results[db_id][rnode.prefix] = {'origins': origins}
+        return dict(zip(self.dbnames, results))
+
+    def search_specifics(self, prefix):
+        return self._split(self.tree.search_covered(prefix))
+
+    def search_exact(self, prefix):
+        rnode = self.tree.search_exact(prefix)
+        return self._split([rnode] if rnode else [])
+
+    def search_exact_many(self, prefixes):
+        return self._split(filter(None, (self.tree.search_exact(p)
+                                         for p in prefixes)))
+
+    def search_aggregate(self, prefix):
+        """ the least specific covering prefix of every database """
+        results = dict((dbname, None) for dbname in self.dbnames)
+        found = set()
+        for covering in cache.covering_prefixes(prefix):
+            rnode = self.tree.search_exact(covering)
+            if not rnode:
+                continue
+            for db_id, origins in rnode.data['origins'].items():
+                if db_id not in found:
+                    found.add(db_id)
+                    results[self.dbnames[db_id]] = (
+                        rnode.prefix, {'origins': origins})
+        return results
+
+    def inverseasn(self, asn):
+        return dict((dbname, set(self.asn_prefix_maps[db_id].get(asn, ())))
+                    for db_id, dbname in enumerate(self.dbnames))
+
+    def asset_search(self, name):
+        return dict((dbname, self.assets[db_id].get(name.upper(), []))
+                    for db_id, dbname in enumerate(self.dbnames))
+
+    def asset_search_many(self, names):
+        results = {}
+        for db_id, dbname in enumerate(self.dbnames):
+            assets = self.assets[db_id]
+            results[dbname] = dict((n, assets[n]) for n in names
+                                   if n in assets)
+        return results
+
+
+class _DatabaseView(object):
+
+    def __init__(self, multi, db_id):
+        self.multi = multi
+        self.db_id = db_id
+        self.asn_prefix_map = multi.asn_prefix_maps[db_id]
+        self.assets = multi.assets[db_id]
+
+    def add_route(self, prefix, origin):
+        self.multi.add_route(self.db_id, prefix, origin)
+
+    def delete_route(self, prefix, origin):
+        self.multi.delete_route(self.db_id, prefix, origin)
+
+    def add_asset(self, name, members):
+        self.assets[name.upper()] = frozenset(m.upper() for m in members)
+
+    def delete_asset(self, name):
+        del self.assets[name.upper()]
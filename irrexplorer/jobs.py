@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Background jobs for slow reports
+
+    Jobs run on a fixed number of worker threads. At most max_pending jobs
+    wait for a worker, submit() raises JobPoolFull beyond that so the web
+    front end can tell the client to come back later. A job collects the
+    partial results of every data source as they come in, clients poll it
+    by id until it is done. Finished jobs are forgotten after ttl seconds.
+"""
+
+import time
+import uuid
+import threading
+import Queue
+from collections import OrderedDict
+
+JOB_WORKERS = 4
+MAX_PENDING_JOBS = 32
+JOB_TTL = 300  # seconds
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobPoolFull(Exception):
+    pass
+
+
+class Job(object):
+
+    def __init__(self, func, args):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.state = QUEUED
+        self.partial = OrderedDict()  # source -> result
+        self.info = {}  # extra fields for to_dict, set by func
+        self.result = None
+        self.error = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def progress(self, source, result):
+        """ called by func for every data source that answered """
+        with self.lock:
+            self.partial[source] = result
+
+    def run(self):
+        self.state = RUNNING
+        try:
+            result = self.func(self, *self.args)
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+        else:
+            self.result = result
+            self.state = DONE
+        self.finished = time.time()
+
+    def to_dict(self, partial=True):
+        with self.lock:
+            data = dict(self.info)
+            data.update({'id': self.id, 'state': self.state,
+                         'sources': self.partial.keys()})
+            if partial:
+                data['partial'] = dict(self.partial)
+        if self.state == DONE:
+            data['result'] = self.result
+        elif self.state == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class JobPool(object):
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING_JOBS,
+                 ttl=JOB_TTL):
+        self.workers = workers
+        self.ttl = ttl
+        self.queue = Queue.Queue(max_pending)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._work)
+            t.setDaemon(True)
+            t.start()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            job.run()
+
+    def submit(self, func, *args):
+        """
+        Queue func(job, *args) to run on a worker.
+
+        Raises:
+            JobPoolFull when max_pending jobs are waiting already
+        """
+        job = Job(func, args)
+        with self.lock:
+            self._expire()
+            try:
+                self.queue.put_nowait(job)
+            except Queue.Full:
+                raise JobPoolFull("%i jobs waiting, try again later" %
+                                  self.queue.maxsize)
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _expire(self):
+        expired = time.time() - self.ttl
+        for job_id, job in self.jobs.items():
+            if job.finished is not None and job.finished < expired:
+                del self.jobs[job_id]
@@ -25,27 +25,243 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 from irrexplorer import parser
-import cStringIO
 import gzip
+import re
 import socket
+import threading
 import time
 import urllib2
+import zlib
+import Queue
+
+DUMP_CHUNK_SIZE = 65536  # bytes
+DUMP_PREFETCH = 16  # chunks buffered ahead of the parser
+
+NRTM_CONNECT_TIMEOUT = 30  # seconds
+# a -k session that stays silent this long is considered stale and replaced
+NRTM_IDLE_TIMEOUT = 900  # seconds
+# TCP keepalive: idle seconds before the first probe, probe interval, probes
+NRTM_KEEPALIVE = (60, 15, 4)
+# reconnect delays in seconds (first, maximum), doubled on every retry
+NRTM_RETRY = (1, 60)  # after the server closed the session
+NRTM_ERROR_RETRY = (30, 900)  # after a connection error or %ERROR
+
+
+def prefetch_chunks(fileobj, chunk_size=DUMP_CHUNK_SIZE,
+                    prefetch=DUMP_PREFETCH):
+    """
+    Read fileobj in a background thread, so the download continues while
+    the parser works. At most prefetch chunks are held in memory.
+    """
+    chunks = Queue.Queue(prefetch)
+
+    def reader():
+        try:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                chunks.put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            chunks.put(e)
+
+    t = threading.Thread(target=reader)
+    t.setDaemon(True)
+    t.start()
+    while True:
+        chunk = chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if not chunk:
+            break
+        yield chunk
+
+
+def gunzip_lines(chunks):
+    """
+    Incrementally decompress gzip data and generate the lines in it
+
+    Args:
+        chunks (iterable): compressed data, in pieces of any size
+
+    Returns:
+        generator of lines, including the trailing newline
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    tail = ''
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            # concatenated gzip members: start over on the remaining data
+            chunk = decompressor.unused_data
+            if chunk:
+                data += decompressor.flush()
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if not data:
+                continue
+            lines = (tail + data).split('\n')
+            tail = lines.pop()
+            for line in lines:
+                yield line + '\n'
+    tail += decompressor.flush()
+    if tail:
+        for line in tail.split('\n'):
+            yield line + '\n'
+
+
+# "%ERROR:401: invalid range: Not within 1-12345"
+INVALID_RANGE = re.compile(r'%ERROR:\s*401:\s*invalid range.*?(\d+)\s*-\s*(\d+)')
+
+
+class NRTMError(Exception):
+    """The NRTM server answered with an %ERROR line"""
+
+
+def past_last_serial(line, serial):
+    """
+    Whether the %ERROR line rejects a range starting past the last serial
+    of the server, the answer a caught up client gets
+    """
+    match = INVALID_RANGE.match(line)
+    return bool(match) and serial > int(match.group(2))
+
+
+class Backoff(object):
+    """Delay that doubles on every step, up to maximum"""
+    def __init__(self, initial, maximum):
+        self.initial = initial
+        self.maximum = maximum
+        self.reset()
+
+    def reset(self):
+        self.delay = self.initial
+
+    def step(self):
+        delay = self.delay
+        self.delay = min(delay * 2, self.maximum)
+        return delay
+
+
+class NRTMConnection(object):
+    """
+    Follows a database over persistent (-k) NRTM sessions, reconnecting
+    and resuming at the next serial whenever a session ends.
+
+    A session closed by the server, or silent for idle_timeout seconds, is
+    replaced after a short backoff. Servers that do not keep -k sessions
+    open are polled this way, also when they answer a caught up client
+    with an invalid range error. Connection errors and %ERROR answers back off
+    longer. Both backoffs reset once an update comes in.
+    """
+    def __init__(self, host, port, dbname,
+                 connect_timeout=NRTM_CONNECT_TIMEOUT,
+                 idle_timeout=NRTM_IDLE_TIMEOUT, retry=NRTM_RETRY,
+                 error_retry=NRTM_ERROR_RETRY, sleep=time.sleep):
+        self.host = host
+        self.port = port
+        self.dbname = dbname
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.retry = Backoff(*retry)
+        self.error_retry = Backoff(*error_retry)
+        self.sleep = sleep
+        self.persistent = None  # unknown until a session ends
+
+    def connect(self):
+        """Open a socket to the server with keepalive and timeouts set"""
+        s = socket.create_connection((self.host, self.port),
+                                     self.connect_timeout)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for name, value in zip(['TCP_KEEPIDLE', 'TCP_KEEPINTVL',
+                                'TCP_KEEPCNT'], NRTM_KEEPALIVE):
+            if hasattr(socket, name):
+                s.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+        s.settimeout(self.idle_timeout)
+        return s
+
+    def session(self, s, serial):
+        """Request updates from serial onwards, generate the lines"""
+        try:
+            s.sendall('!!\n!nIRRExplorer\n-k -g {}:3:{}-LAST\n'.format(
+                self.dbname, serial))
+            for line in s.makefile('rb'):
+                if line.startswith('%ERROR'):
+                    if past_last_serial(line, serial):
+                        return  # up to date
+                    raise NRTMError(line.strip())
+                yield line
+        finally:
+            s.close()
+
+    def updates(self, serial):
+        """
+        Generate (cmd, serial, obj) for every update from serial onwards,
+        forever. Updates before serial are skipped.
+        """
+        while True:
+            backoff = self.error_retry
+            try:
+                s = self.connect()
+            except socket.error as e:
+                reason = 'connect failed: %s' % e
+            else:
+                backoff = self.retry
+                try:
+                    lines = self.session(s, serial)
+                    for cmd, upd_serial, obj in \
+                            parser.parse_nrtm_stream(lines):
+                        if upd_serial < serial:
+                            continue
+                        self.retry.reset()
+                        self.error_retry.reset()
+                        serial = upd_serial + 1
+                        yield cmd, upd_serial, obj
+                    reason = 'closed by server'
+                    if self.persistent is None:
+                        print "INFO: %s (%s) does not keep -k sessions " \
+                            "open, polling" % (self.host, self.dbname)
+                    self.persistent = False
+                except socket.timeout:
+                    reason = 'idle for %s seconds' % self.idle_timeout
+                    self.persistent = True
+                except (socket.error, NRTMError) as e:
+                    reason = str(e)
+                    backoff = self.error_retry
+            delay = backoff.step()
+            print "INFO: NRTM session to %s (%s) %s, reconnecting in %i " \
+                "seconds" % (self.host, self.dbname, reason, delay)
+            self.sleep(delay)
 
 
 class client(object):
     """nrtm client class"""
     def __init__(self, serial=None, serialoverride=None, dump=None,
-                 nrtmhost=None, nrtmport=43, dbname=None):
+                 nrtmhost=None, nrtmport=43, dbname=None,
+                 parse_processes=None, on_loaded=None,
+                 connect_timeout=NRTM_CONNECT_TIMEOUT,
+                 idle_timeout=NRTM_IDLE_TIMEOUT):
+        """
+        on_loaded is called once the dump is loaded, before the first
+        NRTM update
+        """
         self.dbname = dbname
+        self.parse_processes = parse_processes
+        self.on_loaded = on_loaded
         if serialoverride is not None:
             self.serial = serialoverride
         else:
             self.setserialfrom(serial)
+        self.host = None
         if nrtmhost:
             self.host = nrtmhost
             self.port = nrtmport
+            self.connection = NRTMConnection(nrtmhost, nrtmport, dbname,
+                                             connect_timeout, idle_timeout)
 
-        if dump.startswith('ftp'):
+        if dump is None:
+            # resuming from a snapshot, only NRTM updates are needed
+            self.dump = None
+        elif dump.startswith('ftp'):
             self.dump = self.fetch_dump(dump)
         else:
             self.dump = file(dump)
@@ -53,12 +269,13 @@ class client(object):
                 self.dump = gzip.GzipFile(fileobj=self.dump)
 
     def fetch_dump(self, dumpurl):
+        """
+        Open the dump and return a generator of its lines, the dump is
+        decompressed while it comes in and never held in memory as a whole.
+        """
         req = urllib2.Request(dumpurl)
         response = urllib2.urlopen(req)
-        output = cStringIO.StringIO()
-        output.write(response.read())
-        output.seek(0)
-        return gzip.GzipFile(fileobj=output)
+        return gunzip_lines(prefetch_chunks(response))
 
     def setserialfrom(self, f):
         if f.startswith('ftp'):
@@ -70,26 +287,19 @@ class client(object):
 
     def get(self):
         if self.dump:
-            for obj in parser.parse_dump(self.dump):
+            if self.parse_processes > 1:
+                objects = parser.parse_dump_parallel(self.dump,
+                                                     self.parse_processes)
+            else:
+                objects = parser.parse_dump(self.dump)
+            for obj in objects:
                 yield 'ADD', 0, obj
         self.dump = None  # not necessary
         print "INFO: done loading dump for %s" % self.dbname
-        self.serial = self.serial + 1
+        if self.on_loaded:
+            self.on_loaded()
         if self.host:
-            while True:
-                (family, socktype, proto, canonname, sockaddr) = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0]
-                s = socket.socket(family, socktype, proto)
-                s.connect(sockaddr)
-                f = s.makefile()
-                f.write('!!\n!nIRRExplorer\n')
-                f.flush()
-                f.write('-k -g {}:3:{}-LAST\n'.format(self.dbname, self.serial))
-                f.flush()
-                for cmd, serial, obj in parser.parse_nrtm_stream(f):
-                    if serial > self.serial:
-                        print "%s: %s %s @ %s" % (self.dbname, cmd, obj, serial)
-                        self.serial = serial
-                        yield cmd, serial, obj
-                print "sleeping 300 seconds before reconnecting to %s (%s)" % \
-                    (self.host, self.dbname)
-                time.sleep(300)
+            for cmd, serial, obj in self.connection.updates(self.serial + 1):
+                print "%s: %s %s @ %s" % (self.dbname, cmd, obj, serial)
+                self.serial = serial
+                yield cmd, serial, obj
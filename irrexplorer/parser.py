@@ -31,6 +31,30 @@
 """
 
 
+from collections import deque
+from itertools import islice
+import marshal
+import multiprocessing
+
+INTERESTING_CLASSES = ("route", "route6", "as-set")
+
+PARALLEL_CHUNK_LINES = 250000
+
+
+def fetch_value(line):
+    """ value of an attribute line, without comments and whitespace """
+    return line.partition(':')[2].partition('#')[0].strip()
+
+
+def parse_origin(value):
+    """ "AS65000" or asdot "AS1.10" to an int """
+    origin = value[2:]
+    if '.' in origin:
+        high, low = map(int, origin.split('.'))
+        return (high << 16) + low
+    return int(origin)
+
+
 def parse_object(rpsl_object):
     """
     Args:
@@ -40,71 +64,135 @@ def parse_object(rpsl_object):
         None if the object is not of interest
         (dict) if the object was route{,6} or as-set
     """
+    object_type, sep, _ = rpsl_object[0].partition(':')
+    if not sep or object_type not in INTERESTING_CLASSES:
+        return None
+    result = {"kind": object_type, "name": fetch_value(rpsl_object[0])}
 
-    def fetch_value(line):
-        try:
-            return line.split(':', 1)[1].split('#')[0].strip()
-        except IndexError:  #FIXME unsure why this is needed
-            print line
-            import sys
-            sys.exit(0)
-
-    object_type = rpsl_object[0].split(':')[0]
-    object_name = fetch_value(rpsl_object.pop(0))
-    result = {"kind": object_type, "name": object_name}
-
-    if object_type in ["route", "route6"]:
-        for line in rpsl_object:
-            if line.split(':')[0] == "origin":
-                origin = fetch_value(line)[2:]
-                if '.' in origin:
-                    high, low = map(int, origin.split('.'))
-                    result['origin'] = (high << 16) + low
-                else:
-                    result['origin'] = int(origin)
-            if line.split(':')[0] == "source":
-                result['source'] = fetch_value(line)
-        return result
-
-    elif object_type == "as-set":
-        result['members'] = []
+    if object_type == "as-set":
+        members = []
         in_members_context = False
-        while rpsl_object:
-            line = rpsl_object.pop(0).split('#')[0]
-            if line.split(':')[0] == "source":
+        for line in islice(rpsl_object, 1, None):
+            line = line.partition('#')[0]
+            attribute = line.partition(':')[0]
+            if attribute == "source":
                 result['source'] = fetch_value(line)
-            elif line.split(':')[0] == "members":
-                members = fetch_value(line).split(',')
-                result['members'] += map(str.strip, members)
+            elif attribute == "members":
+                members.extend(m.strip() for m in fetch_value(line).split(','))
                 in_members_context = True
-            elif in_members_context and not line.lstrip() == line:
-                result['members'] += map(str.strip, line.split(','))
+            elif in_members_context and line[:1].isspace():
+                members.extend(m.strip() for m in line.split(','))
             else:
                 in_members_context = False
-        result['members'] = set(filter(None, result['members']))
+        result['members'] = set(filter(None, members))
         return result
 
+    for line in islice(rpsl_object, 1, None):
+        attribute = line.partition(':')[0]
+        if attribute == "origin":
+            result['origin'] = parse_origin(fetch_value(line))
+        elif attribute == "source":
+            result['source'] = fetch_value(line)
+    return result
+
 
 def parse_dump(dumpfile):
     """
     Take a file object and find objects of interest, can be called as generator
 
+    Objects of other classes are skipped as soon as their first line has
+    been seen, their attributes are never collected.
+
     Args:
         parse_dump (file)
 
     Returns:
-        dict or None
+        dict
     """
     rpsl_object = []
+    skipping = False
     for line in dumpfile:
         if line.startswith(('%', '#')):
             continue
-        if line.startswith(" ") or line.strip():
-            rpsl_object.append(line)
-        else:
+        if not line.startswith(" ") and (not line or line.isspace()):
+            # blank line, end of the object
             if rpsl_object:
-                yield parse_object(rpsl_object)
+                obj = parse_object(rpsl_object)
+                if obj:
+                    yield obj
             rpsl_object = []
+            skipping = False
+        elif skipping:
+            continue
+        elif not rpsl_object and \
+                line.partition(':')[0] not in INTERESTING_CLASSES:
+            skipping = True
+        else:
+            rpsl_object.append(line)
+    if rpsl_object:
+        obj = parse_object(rpsl_object)
+        if obj:
+            yield obj
+
+
+def split_dump(dumpfile, chunk_lines=PARALLEL_CHUNK_LINES):
+    """
+    Cut a dump in to pieces of at least chunk_lines lines, only on blank
+    lines between objects. Pieces are joined in to a single string, which
+    is far cheaper to send to another process than a list of lines.
+    """
+    chunk = []
+    for line in dumpfile:
+        chunk.append(line)
+        if len(chunk) >= chunk_lines and not line.startswith(" ") and \
+                (not line or line.isspace()):
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _parse_chunk(chunk):
+    """
+    Pool side of parse_dump_parallel. The objects are returned marshalled,
+    which is several times faster to transfer than pickled dicts and sets.
+    """
+    lines = [line + '\n' for line in chunk.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    return marshal.dumps(list(parse_dump(lines)))
+
+
+def parse_dump_parallel(dumpfile, processes=None,
+                        chunk_lines=PARALLEL_CHUNK_LINES):
+    """
+    Same as parse_dump, but the objects are parsed by a pool of processes.
+    Objects are generated in dump order. Only a few chunks per process are
+    in flight at any time, the dump is not read ahead further than that.
+
+    Args:
+        dumpfile (file)
+        processes (int): pool size, defaults to the number of cores
+        chunk_lines (int): lines per unit of work
+
+    Returns:
+        dict
+    """
+    pool = multiprocessing.Pool(processes)
+    in_flight = deque()
+    max_in_flight = 2 * (processes or multiprocessing.cpu_count())
+    try:
+        for chunk in split_dump(dumpfile, chunk_lines):
+            in_flight.append(pool.apply_async(_parse_chunk, (chunk,)))
+            while len(in_flight) >= max_in_flight:
+                for obj in marshal.loads(in_flight.popleft().get()):
+                    yield obj
+        while in_flight:
+            for obj in marshal.loads(in_flight.popleft().get()):
+                yield obj
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
 
 
 def parse_nrtm_stream(f):
@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Read-only, memory-mapped prefix index
+
+    Workers periodically dump the contents of their radix tree into a flat
+    file of fixed size records, sorted on (family, network, prefixlen). The
+    web process maps these files and answers exact, covered and aggregate
+    lookups with binary searches, without going through the lookup queues.
+
+    File layout:
+        header:  magic, flags, number of records, number of origins
+        records: family, network (high 64 bits, low 64 bits), prefixlen,
+                 offset and count in to the origin array
+        origins: 32 bit ASNs
+"""
+
+import os
+import mmap
+import time
+import socket
+import struct
+import threading
+
+MAGIC = 'IRXIDX01'
+FLAG_SINGLE_ORIGIN = 1
+
+HEADER = struct.Struct('!8sBII')
+RECORD = struct.Struct('!BQQBIH')
+ORIGIN = struct.Struct('!I')
+
+PUBLISH_INTERVAL = 10  # seconds
+# wait at least this many times the duration of the last publish before
+# the next one, so publishing takes at most a tenth of the worker's time
+PUBLISH_COST_FACTOR = 10
+
+BITS = {4: 32, 6: 128}
+MASK64 = (1 << 64) - 1
+
+
+def prefix_to_key(prefix):
+    """
+    Args:
+        prefix (str): "192.0.2.0/24" or "2001:db8::/32"
+
+    Returns:
+        (family, network, prefixlen) tuple, host bits cleared
+    """
+    try:
+        address, prefixlen = prefix.split('/')
+        prefixlen = int(prefixlen)
+    except ValueError:
+        raise ValueError("not a valid prefix: %s" % prefix)
+    try:
+        if ':' in address:
+            family = 6
+            hi, lo = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6,
+                                                           address))
+            network = (hi << 64) | lo
+        else:
+            family = 4
+            network = struct.unpack('!I', socket.inet_aton(address))[0]
+    except (socket.error, struct.error):
+        raise ValueError("not a valid prefix: %s" % prefix)
+    bits = BITS[family]
+    if not 0 <= prefixlen <= bits:
+        raise ValueError("not a valid prefix: %s" % prefix)
+    hostmask = (1 << (bits - prefixlen)) - 1
+    return family, network & ~hostmask, prefixlen
+
+
+def normalize_prefix(prefix):
+    """ prefix written the way radix trees write it """
+    return key_to_prefix(*prefix_to_key(prefix))
+
+
+def pack_prefix(prefix):
+    """
+    A prefix packed in to a single integer, equal for equal prefixes no
+    matter how they were written down
+    """
+    family, network, prefixlen = prefix_to_key(prefix)
+    return (((network << 8) | prefixlen) << 1) | (family == 6)
+
+
+def key_to_prefix(family, network, prefixlen):
+    if family == 4:
+        address = socket.inet_ntoa(struct.pack('!I', network))
+    else:
+        address = socket.inet_ntop(socket.AF_INET6,
+                                   struct.pack('!QQ', network >> 64,
+                                               network & MASK64))
+    return "%s/%i" % (address, prefixlen)
+
+
+def tree_entries(tree, single_origin=False):
+    """
+    Generate (prefix, origins) tuples from a radix tree, suitable for
+    write_index()
+    """
+    for rnode in tree.nodes():
+        origins = rnode.data.get('origins')
+        if origins is None:
+            continue
+        if single_origin:
+            origins = [origins]
+        yield rnode.prefix, origins
+
+
+def write_index(path, entries, single_origin=False):
+    """
+    Write a prefix index file. The file is written next to the destination
+    and renamed in to place, readers never see a partial index.
+
+    Args:
+        path (str): destination file
+        entries (iterable): (prefix, origins) tuples
+        single_origin (bool): origins are a single ASN instead of a list
+    """
+    keyed = []
+    for prefix, origins in entries:
+        keyed.append((prefix_to_key(prefix), origins))
+    keyed.sort(key=lambda entry: entry[0])
+
+    tmp_path = '%s.%i.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        n_origins = sum(len(origins) for _, origins in keyed)
+        flags = FLAG_SINGLE_ORIGIN if single_origin else 0
+        f.write(HEADER.pack(MAGIC, flags, len(keyed), n_origins))
+        offset = 0
+        for (family, network, prefixlen), origins in keyed:
+            f.write(RECORD.pack(family, network >> 64, network & MASK64,
+                                prefixlen, offset, len(origins)))
+            offset += len(origins)
+        for _, origins in keyed:
+            for origin in origins:
+                f.write(ORIGIN.pack(origin))
+    os.rename(tmp_path, path)
+
+
+def remove_index(path):
+    """
+    Remove an index left behind by a previous run, readers must not
+    answer from it before the worker published its current tree
+    """
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _Mapping(object):
+    """ One opened generation of an index file """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.flags, self.count, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a prefix index" % path)
+        self.origin_base = HEADER.size + self.count * RECORD.size
+
+    def key(self, idx):
+        family, hi, lo, prefixlen, _, _ = \
+            RECORD.unpack_from(self.mm, HEADER.size + idx * RECORD.size)
+        return family, (hi << 64) | lo, prefixlen
+
+    def origins(self, idx):
+        offset, count = RECORD.unpack_from(
+            self.mm, HEADER.size + idx * RECORD.size)[4:]
+        start = self.origin_base + offset * ORIGIN.size
+        origins = [ORIGIN.unpack_from(self.mm, start + i * ORIGIN.size)[0]
+                   for i in range(count)]
+        if self.flags & FLAG_SINGLE_ORIGIN:
+            return origins[0]
+        return origins
+
+    def lower_bound(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key):
+        idx = self.lower_bound(key)
+        if idx < self.count and self.key(idx) == key:
+            return idx
+        return None
+
+
+class PrefixIndex(object):
+    """
+    Lookup side of a prefix index file. The file is reopened whenever the
+    publishing worker renamed a new version in to place. Lookup results have
+    the same shape as those returned by the lookup worker threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mapping = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """ Returns the current mapping, or None if nothing was published """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return self._mapping
+        current = self._mapping
+        if current is not None and \
+                (st.st_ino, st.st_mtime) == \
+                (current.stat.st_ino, current.stat.st_mtime):
+            return current
+        with self._lock:
+            try:
+                self._mapping = _Mapping(self.path)
+            except (IOError, OSError, ValueError) as e:
+                print "ERROR: could not map prefix index %s: %s" % \
+                    (self.path, e)
+        return self._mapping
+
+    @property
+    def available(self):
+        return self.refresh() is not None
+
+    def search_exact(self, target):
+        m = self.refresh()
+        key = prefix_to_key(target)
+        idx = m.find(key)
+        if idx is None:
+            return {}
+        return {key_to_prefix(*key): {'origins': m.origins(idx)}}
+
+    def search_specifics(self, target):
+        m = self.refresh()
+        family, network, prefixlen = prefix_to_key(target)
+        last = network | ((1 << (BITS[family] - prefixlen)) - 1)
+        results = {}
+        idx = m.lower_bound((family, network, prefixlen))
+        while idx < m.count:
+            key = m.key(idx)
+            if key[0] != family or key[1] > last:
+                break
+            if key[2] >= prefixlen:
+                results[key_to_prefix(*key)] = {'origins': m.origins(idx)}
+            idx += 1
+        return results
+
+    def search_aggregate(self, target):
+        m = self.refresh()
+        family, network, prefixlen = prefix_to_key(target)
+        bits = BITS[family]
+        for length in range(prefixlen + 1):
+            masked = network & ~((1 << (bits - length)) - 1)
+            idx = m.find((family, masked, length))
+            if idx is not None:
+                return (key_to_prefix(family, masked, length),
+                        {'origins': m.origins(idx)})
+        return None
+
+    def lookup(self, query_type, target):
+        if query_type == "search_specifics":
+            return self.search_specifics(target)
+        elif query_type == "search_aggregate":
+            return self.search_aggregate(target)
+        elif query_type == "search_exact":
+            return self.search_exact(target)
+        raise ValueError("query %s is not served by the prefix index" %
+                         query_type)
+
+
+class IndexPublisher(threading.Thread):
+    """
+    Rewrites the prefix index of a radix tree when the tree was changed
+    since the last write. Nothing is published before the ready event is
+    set, a half loaded tree changes all the time. Between two writes there
+    are at least interval seconds, and at least PUBLISH_COST_FACTOR times
+    the duration of the last write. The tree is walked under the read side
+    of lock, the rwlock.ReadWriteLock its writer holds while changing it.
+    """
+
+    def __init__(self, tree, path, single_origin=False,
+                 interval=PUBLISH_INTERVAL, notifier=None, ready_event=None,
+                 lock=None):
+        threading.Thread.__init__(self)
+        self.tree = tree
+        self.lock = lock
+        self.path = path
+        self.single_origin = single_origin
+        self.interval = interval
+        self.notifier = notifier
+        self.ready_event = ready_event
+        self.dirty = True
+        self.publish_time = 0
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def next_delay(self):
+        return max(self.interval, self.publish_time * PUBLISH_COST_FACTOR)
+
+    def publish(self):
+        self.dirty = False
+        # changes are only announced once readers can see them
+        changes = self.notifier.take() if self.notifier else None
+        t_start = time.time()
+        if self.lock is None:
+            entries = list(tree_entries(self.tree, self.single_origin))
+        else:
+            with self.lock.reading():
+                entries = list(tree_entries(self.tree, self.single_origin))
+        write_index(self.path, entries, self.single_origin)
+        self.publish_time = time.time() - t_start
+        if self.notifier:
+            self.notifier.send(changes)
+        print "INFO: published prefix index %s in %.2f seconds" % \
+            (self.path, self.publish_time)
+
+    def run(self):
+        if self.ready_event is not None:
+            self.ready_event.wait()
+        while True:
+            if self.dirty:
+                self.publish()
+            time.sleep(self.next_delay())
@@ -30,6 +30,43 @@ import time
 import threading
 import multiprocessing
 
+#FIXME shipping with hardcoded data is not the nicest approach
+RIPE_MANAGED_SPACE = 'data/ripe-managed-space.txt'
+
+
+class RIPEManagedSpace(object):
+    """
+    The RIPE managed address space, small enough to be loaded in every
+    process that needs it and checked without going through a worker.
+    """
+
+    def __init__(self, tree=None, prefixes=None, path=RIPE_MANAGED_SPACE):
+        self.tree = tree if tree is not None else radix.Radix()
+        self.prefixes = prefixes if prefixes is not None else []
+        for prefix in open(path).readlines():
+            prefix = prefix.strip()
+            if not prefix:
+                continue
+            self.tree.add(prefix)
+            self.prefixes.append(prefix)
+
+    def is_covered(self, target):
+        """
+        Returns:
+            the RIPE managed prefix covering target, or None
+        """
+        rnode = self.tree.search_worst(target)
+        if rnode:
+            return rnode.prefix
+        return None
+
+    def is_covered_many(self, targets):
+        """
+        Returns:
+            dict mapping every target to is_covered(target)
+        """
+        return dict((target, self.is_covered(target)) for target in targets)
+
 
 class RIPELookupWorker(threading.Thread):
     """
@@ -43,24 +80,23 @@ class RIPELookupWorker(threading.Thread):
         self.prefixes = prefixes
         self.lookup_queue = lookup_queue
         self.result_queue = result_queue
-        #FIXME shipping with hardcoded data is not the nicest approach
-        for prefix in open('data/ripe-managed-space.txt').readlines():
-            self.tree.add(prefix.strip())
-            self.prefixes.append(prefix.strip())
+        self.managed_space = RIPEManagedSpace(self.tree, self.prefixes)
 
     def run(self):
         while True:
-            lookup, target = self.lookup_queue.get()
+            request_id, lookup, target = self.lookup_queue.get()
             if not lookup:
                 continue
             if lookup == "is_covered":
                 print "Received lookup request for: %s %s" % (lookup, target)
-                result = self.tree.search_worst(target)
-                if result:
-                    result = result.prefix
-                else:
-                    result = None
-                self.result_queue.put(result)
+                result = self.managed_space.is_covered(target)
+                self.result_queue.put((request_id, result))
+
+            elif lookup == "is_covered_many":
+                print "Received lookup request for: %s (%i prefixes)" % \
+                    (lookup, len(target))
+                result = self.managed_space.is_covered_many(target)
+                self.result_queue.put((request_id, result))
 
             self.lookup_queue.task_done()
 
@@ -94,6 +130,6 @@ if __name__ == "__main__":
     a = RIPEWorker(lookup_queue, result_queue)
     a.start()
     a.ready_event.wait()
-    lookup_queue.put(("is_covered", "194.33.96.0/24"))
+    lookup_queue.put((1, "is_covered", "194.33.96.0/24"))
     lookup_queue.join()
     print result_queue.get()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Readers-writer lock for the lookup threads and the NRTM ingestion
+
+    Any number of lookups read at the same time, an update writes alone.
+    Readers go first: a writer does not start a new update while a reader
+    is waiting, so a lookup waits for at most the one update in progress,
+    however busy the feed is. Waiting for the lock releases the GIL, which
+    hands the interpreter to the lookup thread as well.
+"""
+
+import threading
+
+
+class ReadWriteLock(object):
+
+    def __init__(self):
+        self.mutex = threading.Lock()
+        self.cond = threading.Condition(self.mutex)
+        self.readers = 0
+        self.waiting = 0  # readers
+        self.writers_waiting = 0
+        self.writer = False
+        self._reading = _Holder(self.acquire_read, self.release_read)
+        self._writing = _Holder(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        with self.mutex:
+            if self.writer:
+                self.waiting += 1
+                while self.writer:
+                    self.cond.wait()
+                self.waiting -= 1
+            self.readers += 1
+
+    def release_read(self):
+        with self.mutex:
+            self.readers -= 1
+            if not self.readers and self.writers_waiting:
+                self.cond.notify_all()
+
+    def acquire_write(self):
+        with self.mutex:
+            if self.writer or self.readers or self.waiting:
+                self.writers_waiting += 1
+                while self.writer or self.readers or self.waiting:
+                    self.cond.wait()
+                self.writers_waiting -= 1
+            self.writer = True
+
+    def release_write(self):
+        with self.mutex:
+            self.writer = False
+            if self.waiting or self.writers_waiting:
+                self.cond.notify_all()
+
+    def reading(self):
+        """ with lock.reading(): ... """
+        return self._reading
+
+    def writing(self):
+        """ with lock.writing(): ... """
+        return self._writing
+
+
+class _Holder(object):
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    On-disk snapshots of the state of a NRTMWorker
+
+    A snapshot holds the routes in the radix tree, the inverse ASN map, the
+    as-sets and the serial of the last applied NRTM update. A restarted
+    worker loads the snapshot and continues NRTM at serial + 1 instead of
+    downloading and parsing the full dump again.
+"""
+
+import os
+import time
+import cPickle
+import threading
+
+from irrexplorer import prefixindex
+
+SNAPSHOT_VERSION = 2  # 2: origins are tuples
+SNAPSHOT_INTERVAL = 600  # seconds
+
+# NRTM servers only keep a limited history, an older snapshot can not be
+# brought up to date and the dump has to be loaded instead
+SNAPSHOT_MAX_AGE = 86400  # seconds
+
+
+def capture(dbname, serial, tree, asn_prefix_map, assets):
+    """
+    Copy the state of a worker in to plain, picklable data structures
+    """
+    return {
+        'version': SNAPSHOT_VERSION,
+        'dbname': dbname,
+        'serial': serial,
+        'time': time.time(),
+        'routes': [(rnode.prefix, rnode.data['origins'])
+                   for rnode in tree.nodes()],
+        'asn_prefix_map': dict((asn, list(prefixes))
+                               for asn, prefixes in asn_prefix_map.items()),
+        'assets': dict((name, list(members))
+                       for name, members in assets.items()),
+    }
+
+
+def write_snapshot(path, state):
+    tmp_path = '%s.%i.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        cPickle.dump(state, f, cPickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_path, path)
+
+
+def load_snapshot(path, dbname, max_age=SNAPSHOT_MAX_AGE):
+    """
+    Returns:
+        the snapshot state dict, or None if there is no usable snapshot
+    """
+    try:
+        with open(path, 'rb') as f:
+            # the writer touches a snapshot that is still current
+            mtime = os.fstat(f.fileno()).st_mtime
+            state = cPickle.load(f)
+    except IOError:
+        return None
+    except Exception as e:
+        print "ERROR: could not read snapshot %s: %s" % (path, e)
+        return None
+
+    if state.get('version') != SNAPSHOT_VERSION or \
+            state.get('dbname') != dbname:
+        print "INFO: ignoring incompatible snapshot %s" % path
+        return None
+    if time.time() - mtime > max_age:
+        print "INFO: ignoring snapshot %s, older than %i seconds" % \
+            (path, max_age)
+        return None
+    return state
+
+
+def restore(state, tree, asn_prefix_map, assets):
+    """
+    Fill the (empty) tree, inverse ASN map and as-sets of a worker in place,
+    the lookup threads hold references to these objects.
+    """
+    for prefix, origins in state['routes']:
+        tree.add(prefix).data['origins'] = origins
+    for asn, prefixes in state['asn_prefix_map'].items():
+        # older snapshots have prefixes the way the route object wrote them
+        asn_prefix_map[asn] = set(intern(prefixindex.normalize_prefix(p))
+                                  for p in prefixes)
+    for name, members in state['assets'].items():
+        assets[name] = frozenset(members)
+
+
+class SnapshotWriter(threading.Thread):
+    """
+    Periodically snapshot a NRTMWorker, once its dump has been loaded and
+    whenever the serial moved since the previous snapshot. A snapshot of a
+    quiet database is touched instead, so it does not expire.
+    """
+
+    def __init__(self, worker, path, interval=SNAPSHOT_INTERVAL):
+        threading.Thread.__init__(self)
+        self.worker = worker
+        self.path = path
+        self.interval = interval
+        self.serial = None
+
+    def snapshot(self):
+        worker = self.worker
+        if worker.feed.dump is not None:
+            return  # still loading the dump
+        if worker.serial == self.serial:
+            os.utime(self.path, None)
+            return
+        t_start = time.time()
+        with worker.lock.reading():
+            serial = worker.serial
+            state = capture(worker.dbname, serial, worker.tree,
+                            worker.asn_prefix_map, worker.assets)
+        write_snapshot(self.path, state)
+        self.serial = serial
+        print "INFO: wrote snapshot of %s at serial %i in %.2f seconds" % \
+            (worker.dbname, serial, time.time() - t_start)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.snapshot()
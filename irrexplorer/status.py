@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+    Load progress of the workers
+
+    A LoadStatus lives in shared memory, created by the web process before
+    the worker is started. The worker counts the objects it applied and
+    the serial it is at, the web process reads them without asking the
+    worker, which is busy loading.
+"""
+
+import multiprocessing
+
+LOADING = 'loading'
+READY = 'ready'
+
+
+class LoadStatus(object):
+
+    def __init__(self, name):
+        self.name = name
+        # single writer, no lock needed
+        self._objects = multiprocessing.Value('L', 0, lock=False)
+        self._serial = multiprocessing.Value('l', -1, lock=False)
+        self.ready_event = multiprocessing.Event()
+
+    def applied(self, count=1):
+        """ count objects (updates) applied """
+        self._objects.value += count
+
+    def set_objects(self, objects):
+        self._objects.value = objects
+
+    def set_serial(self, serial):
+        self._serial.value = serial
+
+    def set_ready(self):
+        self.ready_event.set()
+
+    def set_loading(self):
+        """ back to loading, the worker starts over """
+        self.ready_event.clear()
+
+    def is_ready(self):
+        return self.ready_event.is_set()
+
+    def to_dict(self):
+        serial = self._serial.value
+        return {
+            'state': READY if self.is_ready() else LOADING,
+            'objects': self._objects.value,
+            'serial': serial if serial >= 0 else None,
+        }
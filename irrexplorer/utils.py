@@ -24,7 +24,12 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
+import bisect
 import ipaddr
+import radix
+from collections import OrderedDict
+
+from irrexplorer import prefixindex
 
 def is_ipnetwork(data):
     try:
@@ -33,24 +38,18 @@ def is_ipnetwork(data):
     except ValueError:
         return False
 
-def lookup_assets(asset, seen=None):
-    if seen is None:
-        seen = []
-
-    x = query("asset_search", asset)
+def parse_autnum(autnum):
+    """
+    Returns:
+        the ASN of "AS65000" or "65000" as int
 
-    for db in x:
-        if not x[db]:
-            continue
-        for elem in x[db]:
-            if elem in seen:
-                continue
-            if is_autnum(elem):
-                seen.append(elem)
-            else:
-                seen.append(elem)
-                seen = lookup_assets(elem, seen)
-    return seen
+    Raises:
+        ValueError if autnum is not an AS number
+    """
+    number = autnum[2:] if autnum[:2].upper() == 'AS' else autnum
+    if not number.isdigit():
+        raise ValueError("not an AS number: %s" % autnum)
+    return int(number)
 
 def is_autnum(autnum):
     try:
@@ -62,16 +61,119 @@ def is_autnum(autnum):
     except ValueError:
         return False
 
-def find_more_specifics(target, prefixes):
-    result = []
+def group_by_aggregate(prefixes, find_aggregate):
+    """
+    Group prefixes by the aggregate covering them. The prefixes are visited
+    less specifics first, so find_aggregate is only called for prefixes
+    that are not covered by an aggregate found earlier.
+
+    Args:
+        prefixes (list): prefixes as strings
+        find_aggregate (callable): prefix -> aggregate, raises on failure
+
+    Returns:
+        OrderedDict aggregate -> list of prefixes, and a list of
+        (prefix, error message) tuples for prefixes that could not be placed
+    """
+    keyed = []
+    failed = []
     for prefix in prefixes:
-        if prefix:
-            if ipaddr.IPNetwork(prefix) in ipaddr.IPNetwork(target):
-                result.append(prefix)
-    return result
+        try:
+            keyed.append((prefixindex.prefix_to_key(prefix), prefix))
+        except ValueError as e:
+            failed.append((prefix, str(e)))
+    keyed.sort()
+
+    aggregates = radix.Radix()
+    groups = OrderedDict()
+    for _, prefix in keyed:
+        rnode = aggregates.search_worst(prefix)
+        if rnode:
+            groups[rnode.prefix].append(prefix)
+            continue
+        try:
+            aggregate = find_aggregate(prefix)
+        except Exception as e:
+            failed.append((prefix, str(e)))
+            continue
+        aggregate = aggregates.add(aggregate).prefix
+        groups.setdefault(aggregate, []).append(prefix)
+    return groups, failed
+
+def bulk_report(prefixes, find_aggregate, prefix_report, not_found_row):
+    """
+    Generate one dict per requested prefix, with the report row for that
+    prefix from the report of its aggregate. Every aggregate is looked up
+    and reported on once, no matter how many of the requested prefixes it
+    covers.
+
+    Args:
+        prefixes (list): prefixes as strings
+        find_aggregate (callable): (prefix, missing) -> aggregate, adds the
+            IRR databases which did not answer to the missing list
+        prefix_report (callable): (aggregate, missing) -> (report, missing
+            IRR databases), the aggregate is not looked up again
+        not_found_row (callable): (prefix, report) -> row for a prefix the
+            report of its aggregate has nothing on
+    """
+    aggregate_missing = []
+    groups, failed = group_by_aggregate(
+        prefixes, lambda prefix: find_aggregate(prefix, aggregate_missing))
+    for prefix, error in failed:
+        yield {'prefix': prefix, 'error': error}
+    for aggregate, members in groups.items():
+        try:
+            report, missing = prefix_report(aggregate, aggregate_missing)
+        except Exception as e:
+            for prefix in members:
+                yield {'prefix': prefix, 'aggregate': aggregate,
+                       'error': str(e)}
+            continue
+        for prefix in members:
+            row = report.get(prefixindex.normalize_prefix(prefix))
+            if row is None:
+                row = not_found_row(prefix, report)
+            result = {'prefix': prefix, 'aggregate': aggregate, 'report': row}
+            if missing:
+                result['missing'] = missing
+            yield result
+
+class PrefixRanges(object):
+    """
+    A list of prefixes converted once to integer (network, prefixlen) keys,
+    sorted per address family. The more specifics of a target occupy one
+    contiguous run of networks, found with two binary searches.
+    """
+
+    def __init__(self, prefixes):
+        keyed = {4: [], 6: []}
+        for position, prefix in enumerate(prefixes):
+            if prefix:
+                family, network, prefixlen = prefixindex.prefix_to_key(prefix)
+                keyed[family].append((network, prefixlen, position, prefix))
+        self.networks = {}
+        self.entries = {}
+        for family, entries in keyed.items():
+            entries.sort()
+            self.networks[family] = [e[0] for e in entries]
+            self.entries[family] = entries
+
+    def more_specifics(self, target):
+        """
+        Returns:
+            the prefixes covered by target, including target itself, in
+            the order they were given
+        """
+        family, network, prefixlen = prefixindex.prefix_to_key(target)
+        last = network | ((1 << (prefixindex.BITS[family] - prefixlen)) - 1)
+        networks = self.networks[family]
+        start = bisect.bisect_left(networks, network)
+        end = bisect.bisect_right(networks, last, start)
+        found = [e[2:] for e in self.entries[family][start:end]
+                 if e[1] >= prefixlen]
+        found.sort()
+        return [prefix for _, prefix in found]
 
-def find_more_sp_helper(args):
-    return find_more_specifics(*args)
 
 if __name__ == "__main__":
     pass
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import unittest
+
+from irrexplorer import advice
+
+
+class TestAdvice(unittest.TestCase):
+    def test_00__golden(self):
+        with open('tests/advice_golden.json') as f:
+            cases = json.load(f)
+        for case in cases:
+            row = dict(case['route_objects'], bgp_origin=case['bgp_origin'],
+                       ripe_managed=case['ripe_managed'])
+            advice.classify_rows([row])
+            self.assertEqual((row['advice'], row['label']),
+                             (case['advice'], case['label']), case)
+
+    def test_01__origin_bitsets(self):
+        row = {'bgp_origin': 65000, 'ripe': [65000], 'radb': [65000, 65001],
+               'arin': False, 'ripe_managed': True}
+        self.assertEqual(advice.origin_bitsets(row), {
+            65000: advice.RIPE | advice.DATABASE_BITS['radb'],
+            65001: advice.DATABASE_BITS['radb']})
+
+    def test_02__proxy_objects(self):
+        # foreign route objects with the BGP origin only, the old code
+        # compared the origin against a list here and never matched
+        bitsets = {65000: advice.RIPE | advice.DATABASE_BITS['radb']}
+        self.assertEqual(advice.classify(65000, True, bitsets), (
+            "Proper RIPE DB object, but foreign or proxy objects also exist",
+            "warning"))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
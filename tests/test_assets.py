@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from irrexplorer import assets
+from irrexplorer import cache
+
+DATABASES = {
+    'RIPE': {
+        'AS-TOP': ['AS65000', 'AS-LOOP', 'AS-NESTED'],
+        'AS-LOOP': ['AS65001', 'AS-TOP'],
+        'AS-LEAF': ['AS65005'],
+    },
+    'RADB': {
+        'AS-TOP': ['AS65002'],
+        'AS-NESTED': ['AS65003', 'AS-MISSING', 'AS-LOOP'],
+    },
+}
+
+
+class TestASSetExpander(unittest.TestCase):
+    def setUp(self):
+        self.fetches = []
+        self.expander = assets.ASSetExpander(self.fetch)
+
+    def fetch(self, names):
+        self.fetches.append(sorted(names))
+        result = {}
+        for database, sets in DATABASES.items():
+            result[database] = dict((n, sets[n]) for n in names if n in sets)
+        return result
+
+    def test_00__expand_across_databases(self):
+        expansion = self.expander.expand('as-top')
+        self.assertEqual(expansion['autnums'],
+                         ['AS65000', 'AS65001', 'AS65002', 'AS65003'])
+        self.assertEqual(expansion['sets'],
+                         ['AS-LOOP', 'AS-MISSING', 'AS-NESTED', 'AS-TOP'])
+        self.assertEqual(expansion['unresolved'], ['AS-MISSING'])
+        # one fetch per level of nesting
+        self.assertEqual(self.fetches, [['AS-TOP'], ['AS-LOOP', 'AS-NESTED'],
+                                        ['AS-MISSING']])
+
+    def test_01__memoized(self):
+        self.expander.expand('AS-TOP')
+        self.expander.expand('AS-TOP')
+        self.expander.expand('AS-NESTED')
+        # only the unknown AS-MISSING is asked for again
+        self.assertEqual(self.fetches[3:], [['AS-MISSING']])
+        self.assertFalse('AS-MISSING' in self.expander.members)
+
+    def test_02__invalidate_changed_set(self):
+        self.expander.expand('AS-TOP')
+        self.expander.expand('AS-LEAF')
+        self.expander.invalidate(['as-missing'])
+        self.assertEqual(self.expander.expansions.keys(), ['AS-LEAF'])
+        self.fetches = []
+        DATABASES['RADB']['AS-MISSING'] = ['AS65004']
+        try:
+            expansion = self.expander.expand('AS-TOP')
+        finally:
+            del DATABASES['RADB']['AS-MISSING']
+        self.assertEqual(self.fetches, [['AS-MISSING']])
+        self.assertEqual(expansion['autnums'][-1], 'AS65004')
+        self.assertEqual(expansion['unresolved'], [])
+
+        self.expander.invalidate(cache.FLUSH_ALL)
+        self.assertEqual(self.expander.expansions, {})
+        self.assertEqual(self.expander.members, {})
+
+    def test_03__large_set(self):
+        sets = dict(('AS-SUB%i' % i, ['AS%i' % (i * 10 + j)
+                                      for j in range(10)] + ['AS-BIG'])
+                    for i in range(5000))
+        sets['AS-BIG'] = sorted(sets)
+
+        def fetch(names):
+            return {'RADB': dict((n, sets[n]) for n in names if n in sets)}
+
+        expansion = assets.ASSetExpander(fetch).expand('AS-BIG')
+        self.assertEqual(len(expansion['autnums']), 50000)
+        self.assertEqual(len(expansion['sets']), 5001)
+
+    def test_04__incomplete_answers_not_memoized(self):
+        answering = ['RIPE']
+
+        def fetch(names):
+            return dict((database, self.fetch(names)[database])
+                        for database in answering)
+
+        expander = assets.ASSetExpander(
+            fetch, complete=lambda databases: len(databases) == 2)
+        expansion = expander.expand('AS-TOP')
+        self.assertEqual(expansion['unresolved'], ['AS-NESTED'])
+        self.assertEqual(expander.expansions, {})
+        self.assertEqual(expander.members, {})
+
+        answering.append('RADB')
+        expansion = expander.expand('AS-TOP')
+        self.assertEqual(expansion['unresolved'], ['AS-MISSING'])
+        self.assertEqual(expander.expansions.keys(), ['AS-TOP'])
+
+
+    def test_05__members_bounded(self):
+        expander = assets.ASSetExpander(self.fetch, members_size=2)
+        expander.expand('AS-LEAF')
+        expander.expand('AS-LOOP')
+        # AS-LOOP leads to AS-TOP and AS-NESTED, the oldest sets are dropped
+        self.assertEqual(expander.members.keys(), ['AS-TOP', 'AS-NESTED'])
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
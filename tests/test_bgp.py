@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import tempfile
+import unittest
+import multiprocessing
+import Queue
+
+from irrexplorer import bgp, bgpfeed
+
+
+class TestBGPClient(unittest.TestCase):
+    def test_00__streamed_table(self):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, "192.0.2.0/24 65000\n\nbroken line here\n"
+                     "2001:db8::/32 65001\n")
+        os.close(fd)
+        try:
+            table = bgp.BGPClient(path).get()
+            self.assertEqual(next(table), ('192.0.2.0/24', 65000))
+            self.assertEqual(list(table), [('2001:db8::/32', 65001)])
+        finally:
+            os.unlink(path)
+
+
+class TestBGPWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = bgp.BGPWorker(multiprocessing.JoinableQueue(),
+                                    multiprocessing.JoinableQueue())
+
+    def test_00__incremental_table_update(self):
+        delta = self.worker.apply_table([('192.0.2.0/24', 65000),
+                                         ('198.51.100.0/24', 65000),
+                                         ('203.0.113.0/24', 65001)])
+        self.assertEqual(delta, {'announced': 3, 'withdrawn': 0,
+                                 'changed': 0})
+        tree = self.worker.tree
+
+        delta = self.worker.apply_table([('192.0.2.0/24', 65000),
+                                         ('198.51.100.0/24', 65002),
+                                         ('2001:db8::/32', 65001)])
+        self.assertEqual(delta, {'announced': 1, 'withdrawn': 1,
+                                 'changed': 1})
+        self.assertTrue(self.worker.tree is tree)
+        self.assertEqual(sorted(rnode.prefix for rnode in tree.nodes()),
+                         ['192.0.2.0/24', '198.51.100.0/24', '2001:db8::/32'])
+        self.assertEqual(tree.search_exact('198.51.100.0/24').data,
+                         {'origins': 65002})
+        self.assertEqual(self.worker.asn_prefix_map,
+                         {65000: set(['192.0.2.0/24']),
+                          65001: set(['2001:db8::/32']),
+                          65002: set(['198.51.100.0/24'])})
+
+        delta = self.worker.apply_table([('2001:db8::/32', 65001),
+                                         ('198.51.100.0/24', 65002),
+                                         ('192.0.2.0/24', 65000)])
+        self.assertEqual(delta, {'announced': 0, 'withdrawn': 0,
+                                 'changed': 0})
+
+    def test_01__prefixset(self):
+        self.worker.apply_table([('192.0.2.0/24', 65000),
+                                 ('2001:db8::/32', 65001)])
+        self.assertEqual(bgp.prefixset(self.worker.prefix_keys,
+                                       ['192.0.2.0/24', '192.0.2.0/25',
+                                        '2001:0db8::/32', 'garbage']),
+                         set(['192.0.2.0/24', '2001:0db8::/32']))
+        self.worker.apply_table([])
+        self.assertEqual(self.worker.prefix_keys, set())
+
+    def test_02__exabgp_feed(self):
+        self.worker.apply_change('announce', '203.0.113.0/24', 65000,
+                                 '165.254.255.1')
+        self.assertFalse(self.worker.status.is_ready())
+        self.worker.follow_feed(
+            bgpfeed.ExaBGPFeed('tests/exabgp_messages.json'))
+        self.assertEqual(self.worker.prefixes,
+                         {'178.157.60.0/24': (61129,),
+                          '8.8.8.0/24': (15169,),
+                          '2001:4860::/32': (15169,)})
+        self.assertEqual(self.worker.tree.search_exact('8.8.4.0/24'), None)
+        self.assertEqual(self.worker.asn_prefix_map[15169],
+                         set(['8.8.8.0/24', '2001:4860::/32']))
+        self.assertTrue(self.worker.status.is_ready())
+
+    def test_03__search_exact_many(self):
+        self.worker.apply_table([('192.0.2.0/24', 65000),
+                                 ('2001:db8::/32', 65001)])
+        lookup_queue, result_queue = Queue.Queue(), Queue.Queue()
+        lookup = bgp.BGPLookupWorker(self.worker.tree,
+                                     self.worker.prefix_keys,
+                                     self.worker.asn_prefix_map,
+                                     lookup_queue, result_queue)
+        lookup.start()
+        lookup_queue.put((1, "search_exact_many",
+                          ['192.0.2.0/24', '192.0.2.0/25', '2001:db8::/32']))
+        lookup_queue.put((2, "exit", None))
+        lookup.join()
+        self.assertEqual(result_queue.get_nowait(),
+                         (1, {'192.0.2.0/24': {'origins': 65000},
+                              '2001:db8::/32': {'origins': 65001}}))
+
+    def test_04__apply_in_locked_batches(self):
+        applied = []
+        apply_batch = self.worker.apply_batch
+
+        def table():
+            for i in range(5):
+                # the table is read without holding the write lock
+                self.assertFalse(self.worker.lock.writer)
+                yield '192.0.%i.0/24' % i, 65000
+
+        def record_batch(batch):
+            applied.append(len(batch))
+            apply_batch(batch)
+
+        self.worker.apply_batch = record_batch
+        batch_size = bgp.APPLY_BATCH
+        bgp.APPLY_BATCH = 2
+        try:
+            self.worker.apply_table(table())
+        finally:
+            bgp.APPLY_BATCH = batch_size
+        self.assertEqual(applied, [2, 2, 1])
+        self.assertEqual(len(self.worker.prefixes), 5)
+        self.assertFalse(self.worker.lock.writer)
+
+    def test_05__peer_down_and_reconnect(self):
+        feed = Feed(
+            update('192.0.2.1', '"announce": { "ipv4 unicast": { '
+                   '"192.0.2.1": { "198.51.100.0/24": { } } } }'),
+            update('192.0.2.2', '"announce": { "ipv4 unicast": { '
+                   '"192.0.2.2": { "203.0.113.0/24": { } } } }'),
+            '{ "type": "state", "neighbor": { "address": { '
+            '"peer": "192.0.2.1" }, "state": "down" } }')
+        self.worker.follow_feed(feed)
+        self.assertEqual(self.worker.prefixes, {'203.0.113.0/24': (65001,)})
+        self.assertTrue(self.worker.status.is_ready())
+
+        self.worker.flush_feed()
+        self.assertEqual(self.worker.prefixes, {})
+        self.assertEqual(self.worker.tree.nodes(), [])
+        self.assertEqual(self.worker.asn_prefix_map, {})
+        self.assertFalse(self.worker.status.is_ready())
+
+    def test_06__ready_on_end_of_rib(self):
+        self.worker.follow_feed(Feed(
+            '{ "type": "update", "neighbor": { "address": { '
+            '"peer": "192.0.2.1" }, "message": { "eor": { '
+            '"afi": "ipv4", "safi": "unicast" } } } }'))
+        self.assertTrue(self.worker.status.is_ready())
+        self.assertEqual(self.worker.prefixes, {})
+
+    def test_07__multiple_origins(self):
+        table = [('192.0.2.0/24', 65001),
+                 ('198.51.100.0/24', 65000),
+                 ('192.0.2.0/24', 65000),
+                 ('192.0.2.0/24', 65001)]
+        delta = self.worker.apply_table(table)
+        self.assertEqual(delta, {'announced': 2, 'withdrawn': 0,
+                                 'changed': 0})
+        self.assertEqual(self.worker.prefixes,
+                         {'192.0.2.0/24': (65000, 65001),
+                          '198.51.100.0/24': (65000,)})
+        self.assertEqual(self.worker.asn_prefix_map,
+                         {65000: set(['192.0.2.0/24', '198.51.100.0/24']),
+                          65001: set(['192.0.2.0/24'])})
+        self.assertEqual(self.worker.tree.search_exact('192.0.2.0/24').data,
+                         {'origins': 65000})
+
+        delta = self.worker.apply_table(reversed(table))
+        self.assertEqual(delta, {'announced': 0, 'withdrawn': 0,
+                                 'changed': 0})
+
+        delta = self.worker.apply_table([('192.0.2.0/24', 65001),
+                                         ('198.51.100.0/24', 65000)])
+        self.assertEqual(delta, {'announced': 0, 'withdrawn': 0,
+                                 'changed': 1})
+        self.assertEqual(self.worker.asn_prefix_map,
+                         {65000: set(['198.51.100.0/24']),
+                          65001: set(['192.0.2.0/24'])})
+        self.assertEqual(self.worker.tree.search_exact('192.0.2.0/24').data,
+                         {'origins': 65001})
+
+    def test_08__routes_from_several_peers(self):
+        announce = '"announce": { "ipv4 unicast": { "%s": { ' \
+            '"198.51.100.0/24": { } } } }'
+        self.worker.follow_feed(Feed(
+            update('192.0.2.1', announce % '192.0.2.1'),
+            update('192.0.2.2', announce % '192.0.2.2', origin=65002),
+            update('192.0.2.3', announce % '192.0.2.3')))
+        self.assertEqual(self.worker.prefixes,
+                         {'198.51.100.0/24': (65001, 65002)})
+
+        self.worker.follow_feed(Feed(
+            update('192.0.2.1', '"withdraw": { "ipv4 unicast": { '
+                   '"198.51.100.0/24": { } } }'),
+            '{ "type": "state", "neighbor": { "address": { '
+            '"peer": "192.0.2.2" }, "state": "down" } }'))
+        self.assertEqual(self.worker.prefixes, {'198.51.100.0/24': (65001,)})
+        self.assertEqual(self.worker.asn_prefix_map,
+                         {65001: set(['198.51.100.0/24'])})
+
+        self.assertTrue(self.worker.apply_change(
+            'withdraw', '198.51.100.0/24', None, '192.0.2.3'))
+        self.assertEqual(self.worker.prefixes, {})
+        self.assertEqual(self.worker.route_peers, {})
+        self.assertEqual(self.worker.tree.nodes(), [])
+
+    def test_09__prefixes_keyed_as_the_tree_writes_them(self):
+        delta = self.worker.apply_table([('10.0.0.1/8', 65000),
+                                         ('10.0.0.0/8', 65001),
+                                         ('2001:0db8::/32', 65000),
+                                         ('not a prefix', 65000)])
+        self.assertEqual(delta, {'announced': 2, 'withdrawn': 0,
+                                 'changed': 0})
+        self.assertEqual(self.worker.prefixes,
+                         {'10.0.0.0/8': (65000, 65001),
+                          '2001:db8::/32': (65000,)})
+        self.assertEqual(self.worker.asn_prefix_map,
+                         {65000: set(['10.0.0.0/8', '2001:db8::/32']),
+                          65001: set(['10.0.0.0/8'])})
+        self.assertEqual(sorted(rnode.prefix
+                                for rnode in self.worker.tree.nodes()),
+                         sorted(self.worker.prefixes))
+
+        self.assertTrue(self.worker.apply_change(
+            'announce', '192.0.2.1/24', 65000, '192.0.2.1'))
+        self.assertTrue(self.worker.apply_change(
+            'withdraw', '192.0.2.0/24', None, '192.0.2.1'))
+        self.assertEqual(self.worker.route_peers, {})
+        self.assertFalse('192.0.2.0/24' in self.worker.prefixes)
+
+def update(peer, body, origin=65001):
+    return '{ "type": "update", "neighbor": { "address": { "peer": "%s" }, ' \
+        '"message": { "update": { "attribute": { "as-path": [ %i ] }, ' \
+        '%s } } } }' % (peer, origin, body)
+
+
+class Feed(object):
+    """ ExaBGPFeed from a list of messages """
+    def __init__(self, *messages):
+        self.messages = messages
+
+    def get(self):
+        for message in self.messages:
+            for change in bgpfeed.parse_message(message):
+                yield change
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+import Queue
+
+from irrexplorer import cache
+
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = cache.ReportCache(size=3, ttl=60)
+
+    def put(self, prefix, aggregate, exact=False):
+        self.cache.put(prefix, exact, aggregate, {prefix: aggregate},
+                       self.cache.generation)
+
+    def test_00__get_put_and_lru(self):
+        self.put('10.0.0.0/24', '10.0.0.0/8')
+        self.assertEqual(self.cache.get('10.0.0.0/24'),
+                         {'10.0.0.0/24': '10.0.0.0/8'})
+        self.assertEqual(self.cache.get('10.0.0.0/24', exact=True), None)
+        self.put('11.0.0.0/8', '11.0.0.0/8')
+        self.put('12.0.0.0/8', '12.0.0.0/8')
+        self.cache.get('10.0.0.0/24')
+        self.put('13.0.0.0/8', '13.0.0.0/8')
+        self.assertEqual(self.cache.get('11.0.0.0/8'), None)
+        self.assertTrue(self.cache.get('10.0.0.0/24'))
+
+    def test_01__ttl(self):
+        self.cache.ttl = -1
+        self.put('10.0.0.0/8', '10.0.0.0/8')
+        self.assertEqual(self.cache.get('10.0.0.0/8'), None)
+
+    def test_02__invalidate_overlapping(self):
+        self.put('10.1.0.0/16', '10.0.0.0/8')
+        self.put('11.0.0.0/8', '11.0.0.0/8')
+        self.put('2001:db8::/32', '2001:db8::/32')
+        # a more specific within the aggregate
+        self.cache.invalidate(['10.200.1.0/24'])
+        self.assertEqual(self.cache.get('10.1.0.0/16'), None)
+        self.assertTrue(self.cache.get('11.0.0.0/8'))
+        # a less specific of the aggregate
+        self.cache.invalidate(['2001::/16'])
+        self.assertEqual(self.cache.get('2001:db8::/32'), None)
+        self.assertTrue(self.cache.get('11.0.0.0/8'))
+        self.cache.invalidate(cache.FLUSH_ALL)
+        self.assertEqual(self.cache.get('11.0.0.0/8'), None)
+
+    def test_03__no_put_after_concurrent_change(self):
+        generation = self.cache.generation
+        self.cache.invalidate(['10.0.0.0/8'])
+        self.cache.put('10.0.0.0/8', False, '10.0.0.0/8', {}, generation)
+        self.assertEqual(self.cache.get('10.0.0.0/8'), None)
+
+    def test_04__partial_reports_not_cached(self):
+        builds = []
+
+        def build(missing):
+            def report():
+                builds.append(missing)
+                return '10.0.0.0/8', {'10.0.0.0/8': {}}, missing
+            return report
+
+        # an IRR database did not answer in time
+        self.assertEqual(self.cache.report('10.0.0.0/8', False,
+                                           build(['RADB'])),
+                         ({'10.0.0.0/8': {}}, ['RADB']))
+        self.assertEqual(self.cache.get('10.0.0.0/8'), None)
+        # a data source is still loading
+        self.cache.report('10.0.0.0/8', False, build([]), complete=False)
+        self.assertEqual(self.cache.get('10.0.0.0/8'), None)
+
+        self.cache.report('10.0.0.0/8', False, build([]))
+        self.assertEqual(self.cache.report('10.0.0.0/8', False, build([])),
+                         ({'10.0.0.0/8': {}}, []))
+        self.assertEqual(builds, [['RADB'], [], []])
+
+
+class TestChangeNotifier(unittest.TestCase):
+    def test_00__batches_and_flush_all(self):
+        change_queue = Queue.Queue()
+        notifier = cache.ChangeNotifier(change_queue, 'test')
+        notifier.changed('10.0.0.0/8')
+        notifier.changed('10.0.0.0/8')
+        notifier.flush()
+        notifier.flush()
+        self.assertEqual(change_queue.get_nowait(), ('test', ['10.0.0.0/8']))
+        self.assertTrue(change_queue.empty())
+        for i in range(cache.MAX_CHANGES + 1):
+            notifier.changed('10.%i.%i.0/24' % (i >> 8, i & 255))
+        notifier.flush()
+        self.assertEqual(change_queue.get_nowait(), ('test', cache.FLUSH_ALL))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
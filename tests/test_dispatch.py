@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+import unittest
+import Queue
+
+from irrexplorer import dispatch
+
+
+def echo_worker(lookup_queue, result_queue, delay=0):
+    while True:
+        request_id, lookup, target = lookup_queue.get()
+        time.sleep(delay)
+        result_queue.put((request_id, (lookup, target)))
+
+
+class TestDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.lookup_queues = {}
+        self.result_queues = {}
+        for source, delay in [('fast', 0), ('medium', 0.05), ('slow', 0.5)]:
+            self.lookup_queues[source] = Queue.Queue()
+            self.result_queues[source] = Queue.Queue()
+            worker = threading.Thread(target=echo_worker,
+                                      args=(self.lookup_queues[source],
+                                            self.result_queues[source],
+                                            delay))
+            worker.setDaemon(True)
+            worker.start()
+        self.dispatcher = dispatch.Dispatcher(self.lookup_queues,
+                                              self.result_queues)
+        self.dispatcher.start()
+
+    def test_00__concurrent_callers_get_own_results(self):
+        results = {}
+
+        def caller(n):
+            results[n] = self.dispatcher.query(['fast', 'medium'],
+                                               'search_exact', n)
+
+        callers = [threading.Thread(target=caller, args=(n,))
+                   for n in range(20)]
+        for c in callers:
+            c.start()
+        for c in callers:
+            c.join()
+        for n in range(20):
+            self.assertEqual(results[n], {'fast': ('search_exact', n),
+                                          'medium': ('search_exact', n)})
+
+    def test_01__timeout_leaves_out_slow_source(self):
+        t_start = time.time()
+        result = self.dispatcher.query(['fast', 'slow'], 'search_exact', 1,
+                                       timeout=0.2)
+        self.assertTrue(time.time() - t_start < 0.5)
+        self.assertEqual(result, {'fast': ('search_exact', 1)})
+
+    def test_02__query_one_raises_on_timeout(self):
+        self.assertRaises(dispatch.LookupTimeout, self.dispatcher.query_one,
+                          'slow', 'search_exact', 1, 0.1)
+
+    def test_03__on_result_in_arrival_order(self):
+        answers = []
+        self.dispatcher.query(['slow', 'fast', 'medium'], 'search_exact', 1,
+                              on_result=lambda s, r: answers.append(s))
+        self.assertEqual(answers, ['fast', 'medium', 'slow'])
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import gzip
+import unittest
+import cStringIO
+
+from irrexplorer import nrtm, parser
+
+
+def gzipped(data):
+    output = cStringIO.StringIO()
+    f = gzip.GzipFile(fileobj=output, mode='wb')
+    f.write(data)
+    f.close()
+    return output.getvalue()
+
+
+class TestDumpStream(unittest.TestCase):
+    def setUp(self):
+        self.data = open('tests/irrtest.data').read()
+
+    def test_00__gunzip_lines_any_chunk_size(self):
+        compressed = gzipped(self.data)
+        for size in [1, 7, 4096, len(compressed)]:
+            chunks = [compressed[i:i + size]
+                      for i in range(0, len(compressed), size)]
+            self.assertEqual(''.join(nrtm.gunzip_lines(chunks)), self.data)
+
+    def test_01__multiple_members(self):
+        half = len(self.data) // 2
+        compressed = gzipped(self.data[:half]) + gzipped(self.data[half:])
+        self.assertEqual(''.join(nrtm.gunzip_lines([compressed])), self.data)
+
+    def test_02__streamed_parse_matches_file_parse(self):
+        stream = nrtm.gunzip_lines(nrtm.prefetch_chunks(
+            cStringIO.StringIO(gzipped(self.data)), chunk_size=512))
+        self.assertEqual(list(parser.parse_dump(stream)),
+                         list(parser.parse_dump(open('tests/irrtest.data'))))
+
+    def test_03__on_loaded_after_dump(self):
+        loaded = []
+        client = nrtm.client(serialoverride=10, dump='tests/irrtest.data',
+                             dbname='TEST', on_loaded=lambda: loaded.append(
+                                 client.dump is None))
+        updates = client.get()
+        next(updates)
+        self.assertEqual(loaded, [])
+        rest = list(updates)
+        self.assertTrue(rest)
+        self.assertEqual(loaded, [True])
+        self.assertEqual(client.serial, 10)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
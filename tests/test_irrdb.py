@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+from irrexplorer import irrdb
+
+
+class TestIRRDatabase(unittest.TestCase):
+    def setUp(self):
+        self.db = irrdb.IRRDatabase()
+
+    def test_00__repeated_add_is_deduplicated(self):
+        for _ in range(3):
+            self.db.add_route('192.0.2.0/24', 65000)
+        self.assertEqual(self.db.asn_prefix_map, {65000: set(['192.0.2.0/24'])})
+        self.assertEqual(self.db.tree.search_exact('192.0.2.0/24').data,
+                         {'origins': (65000,)})
+
+    def test_01__delete_cleans_inverse_map(self):
+        self.db.add_route('192.0.2.0/24', 65000)
+        self.db.add_route('198.51.100.0/24', 65000)
+        self.db.delete_route('192.0.2.0/24', 65000)
+        self.assertEqual(self.db.asn_prefix_map,
+                         {65000: set(['198.51.100.0/24'])})
+        self.db.delete_route('198.51.100.0/24', 65000)
+        self.assertEqual(self.db.asn_prefix_map, {})
+        self.assertRaises(KeyError, self.db.delete_route,
+                          '198.51.100.0/24', 65000)
+
+    def test_02__delete_keeps_node_with_other_origins(self):
+        self.db.add_route('192.0.2.0/24', 65000)
+        self.db.add_route('192.0.2.0/24', 65001)
+        self.db.delete_route('192.0.2.0/24', 65000)
+        self.assertEqual(self.db.tree.search_exact('192.0.2.0/24').data,
+                         {'origins': (65001,)})
+        self.assertEqual(self.db.asn_prefix_map,
+                         {65001: set(['192.0.2.0/24'])})
+        self.assertRaises(KeyError, self.db.delete_route,
+                          '192.0.2.0/24', 65000)
+        self.db.delete_route('192.0.2.0/24', 65001)
+        self.assertEqual(self.db.tree.search_exact('192.0.2.0/24'), None)
+        self.assertEqual(self.db.asn_prefix_map, {})
+
+    def test_03__origins_are_shared(self):
+        self.db.add_route('192.0.2.0/24', 65000)
+        self.db.add_route('192.0.2.0/24', 65001)
+        self.db.add_route('198.51.100.0/24', 65000)
+        self.db.add_route('198.51.100.0/24', 65001)
+        self.db.add_route('203.0.113.0/24', 65001)
+        self.db.delete_route('192.0.2.0/24', 65000)
+        origins = [self.db.tree.search_exact(p).data['origins'] for p in
+                   ['192.0.2.0/24', '198.51.100.0/24', '203.0.113.0/24']]
+        self.assertEqual(origins, [(65001,), (65000, 65001), (65001,)])
+        self.assertTrue(origins[0] is origins[2])
+
+    def test_04__asset_names_are_case_insensitive(self):
+        self.db.add_asset('AS-Example', set(['as65000', 'AS-Other']))
+        self.assertEqual(self.db.assets,
+                         {'AS-EXAMPLE': frozenset(['AS65000', 'AS-OTHER'])})
+        self.db.delete_asset('as-example')
+        self.assertEqual(self.db.assets, {})
+        self.assertRaises(KeyError, self.db.delete_asset, 'AS-EXAMPLE')
+
+    def test_05__inverse_map_uses_tree_prefixes(self):
+        self.db.add_route('2001:4860:0000::/32', 15169)
+        self.db.add_route('2001:4860::/32', 15169)
+        self.assertEqual(self.db.asn_prefix_map,
+                         {15169: set(['2001:4860::/32'])})
+        rnode = self.db.tree.search_exact('2001:4860::/32')
+        self.assertTrue(rnode.prefix in self.db.asn_prefix_map[15169])
+        self.db.delete_route('2001:4860:0::/32', 15169)
+        self.assertEqual(self.db.asn_prefix_map, {})
+
+
+class TestMultiIRRDatabase(unittest.TestCase):
+    ROUTES = [
+        ('ripe', '10.0.0.0/8', 65000),
+        ('radb', '10.0.0.0/8', 65001),
+        ('radb', '10.1.0.0/16', 65001),
+        ('ripe', '10.1.1.0/24', 65000),
+        ('radb', '10.1.1.0/24', 65000),
+        ('radb', '10.1.1.0/24', 65002),
+        ('arin', '2001:db8::/32', 65003),
+        ('arin', '2001:0db8:0001::/48', 65003),
+    ]
+
+    def setUp(self):
+        self.multi = irrdb.MultiIRRDatabase(['arin', 'radb', 'ripe'])
+        self.single = dict((name, irrdb.IRRDatabase())
+                           for name in self.multi.dbnames)
+        for name, prefix, origin in self.ROUTES:
+            self.multi.database(name).add_route(prefix, origin)
+            self.single[name].add_route(prefix, origin)
+
+    def specifics(self, prefix):
+        result = {}
+        for name, db in self.single.items():
+            result[name] = dict(
+                (rnode.prefix, {'origins': rnode.data['origins']})
+                for rnode in db.tree.search_covered(prefix))
+        return result
+
+    def test_00__same_answers_as_separate_trees(self):
+        self.assertEqual(len(self.multi.tree.nodes()), 5)
+        for prefix in ['10.0.0.0/8', '10.1.0.0/16', '0.0.0.0/0', '::/0']:
+            self.assertEqual(self.multi.search_specifics(prefix),
+                             self.specifics(prefix))
+        self.assertEqual(self.multi.search_exact('10.1.1.0/24'),
+                         self.specifics('10.1.1.0/24'))
+        self.assertEqual(self.multi.search_aggregate('10.1.1.0/25'), {
+            'arin': None,
+            'radb': ('10.0.0.0/8', {'origins': (65001,)}),
+            'ripe': ('10.0.0.0/8', {'origins': (65000,)})})
+        self.assertEqual(self.multi.search_aggregate('10.2.0.0/16'), {
+            'arin': None,
+            'radb': ('10.0.0.0/8', {'origins': (65001,)}),
+            'ripe': ('10.0.0.0/8', {'origins': (65000,)})})
+        for name in self.multi.dbnames:
+            self.assertEqual(self.multi.database(name).asn_prefix_map,
+                             self.single[name].asn_prefix_map)
+        self.assertEqual(self.multi.inverseasn(65003)['arin'],
+                         set(['2001:db8::/32', '2001:db8:1::/48']))
+
+    def test_01__delete(self):
+        for name, prefix, origin in self.ROUTES:
+            self.multi.database(name).delete_route(prefix, origin)
+            self.single[name].delete_route(prefix, origin)
+            self.assertEqual(self.multi.search_specifics('0.0.0.0/0'),
+                             self.specifics('0.0.0.0/0'))
+        self.assertEqual(self.multi.tree.nodes(), [])
+        self.assertEqual(self.multi.asn_prefix_maps, [{}, {}, {}])
+        self.assertRaises(KeyError, self.multi.database('ripe').delete_route,
+                          '10.0.0.0/8', 65000)
+
+    def test_02__assets(self):
+        self.multi.database('radb').add_asset('AS-Test', ['AS65000'])
+        self.assertEqual(self.multi.asset_search_many(['AS-TEST']), {
+            'arin': {}, 'radb': {'AS-TEST': frozenset(['AS65000'])},
+            'ripe': {}})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
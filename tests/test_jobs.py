@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+import unittest
+
+from irrexplorer import jobs
+
+
+def wait_for(job, timeout=5):
+    deadline = time.time() + timeout
+    while job.state in (jobs.QUEUED, jobs.RUNNING) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestJobPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = jobs.JobPool(workers=1, max_pending=2, ttl=60)
+        self.pool.start()
+
+    def test_00__partial_and_final_results(self):
+        def report(job, prefix):
+            job.info['loading'] = ['radb']
+            job.progress('BGP', {prefix: {'origins': 65000}})
+            job.progress('ripe', {})
+            return {prefix: {'advice': 'Perfect'}}
+
+        job = self.pool.submit(report, '192.0.2.0/24')
+        self.assertTrue(self.pool.get(job.id) is job)
+        wait_for(job)
+        self.assertEqual(job.to_dict(), {
+            'id': job.id, 'state': jobs.DONE, 'sources': ['BGP', 'ripe'],
+            'loading': ['radb'],
+            'partial': {'BGP': {'192.0.2.0/24': {'origins': 65000}},
+                        'ripe': {}},
+            'result': {'192.0.2.0/24': {'advice': 'Perfect'}}})
+        self.assertFalse('partial' in job.to_dict(partial=False))
+
+    def test_01__failure(self):
+        def report(job):
+            raise ValueError('no such prefix')
+
+        job = self.pool.submit(report)
+        wait_for(job)
+        self.assertEqual(job.to_dict(), {'id': job.id, 'state': jobs.FAILED,
+                                         'sources': [], 'partial': {},
+                                         'error': 'no such prefix'})
+
+    def test_02__back_pressure(self):
+        release = threading.Event()
+
+        def blocked(job):
+            release.wait()
+
+        running = self.pool.submit(blocked)
+        while running.state == jobs.QUEUED:
+            time.sleep(0.01)
+        queued = [self.pool.submit(blocked) for _ in range(2)]
+        self.assertRaises(jobs.JobPoolFull, self.pool.submit, blocked)
+        release.set()
+        for job in [running] + queued:
+            wait_for(job)
+            self.assertEqual(job.state, jobs.DONE)
+
+    def test_03__finished_jobs_expire(self):
+        self.pool.ttl = 0
+        job = self.pool.submit(lambda job: None)
+        wait_for(job)
+        time.sleep(0.01)
+        self.pool.submit(lambda job: None)
+        self.assertEqual(self.pool.get(job.id), None)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
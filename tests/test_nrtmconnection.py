@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import socket
+import threading
+import unittest
+
+from irrexplorer import nrtm
+from nrtm_server import nrtm_data_1, nrtm_data_2
+
+
+class Stop(Exception):
+    pass
+
+
+class StubServer(threading.Thread):
+    """
+    NRTM server on localhost, answering each connection with the next
+    handler. A handler gets the socket and returns whether to close it.
+    """
+    def __init__(self, *handlers):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.handlers = list(handlers)
+        self.queries = []
+        self.answers = []
+        self.done = threading.Event()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.port = self.sock.getsockname()[1]
+        self.start()
+
+    def run(self):
+        for handler in self.handlers:
+            conn, addr = self.sock.accept()
+            query = ''
+            while '-g' not in query:
+                query += conn.recv(1024)
+            self.queries.append(query.splitlines()[-1])
+            t = threading.Thread(target=self.answer, args=(handler, conn))
+            t.setDaemon(True)
+            t.start()
+            self.answers.append(t)
+
+    def answer(self, handler, conn):
+        if not handler(conn):
+            self.done.wait(5)
+        conn.close()
+
+    def stop(self):
+        self.done.set()
+        for t in self.answers:
+            t.join()
+        self.sock.close()
+
+
+def send(data):
+    def handler(conn):
+        conn.sendall(data)
+        return True
+    return handler
+
+
+def send_and_hang(data):
+    def handler(conn):
+        conn.sendall(data)
+        return False
+    return handler
+
+
+class TestNRTMConnection(unittest.TestCase):
+    def setUp(self):
+        self.delays = []
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.stop()
+
+    def sleep(self, delay):
+        self.delays.append(delay)
+
+    def connection(self, *handlers, **kwargs):
+        self.server = StubServer(*handlers)
+        return nrtm.NRTMConnection('127.0.0.1', self.server.port,
+                                   'REGRESSION', sleep=self.sleep, **kwargs)
+
+    def take(self, updates, count):
+        return [next(updates)[1] for i in range(count)]
+
+    def test_00__backoff(self):
+        backoff = nrtm.Backoff(1, 5)
+        self.assertEqual([backoff.step() for i in range(5)], [1, 2, 4, 5, 5])
+        backoff.reset()
+        self.assertEqual(backoff.step(), 1)
+
+    def test_01__resume_after_close(self):
+        conn = self.connection(send(nrtm_data_1), send(nrtm_data_2))
+        serials = self.take(conn.updates(1983029), 7)
+        self.assertEqual(serials, range(1983029, 1983036))
+        self.assertEqual(self.server.queries,
+                         ['-k -g REGRESSION:3:1983029-LAST',
+                          '-k -g REGRESSION:3:1983035-LAST'])
+        self.assertEqual(self.delays, [nrtm.NRTM_RETRY[0]])
+        self.assertFalse(conn.persistent)
+
+    def test_02__replace_idle_session(self):
+        conn = self.connection(send_and_hang(nrtm_data_1),
+                               send(nrtm_data_2), idle_timeout=0.2)
+        serials = self.take(conn.updates(1983029), 7)
+        self.assertEqual(serials[-1], 1983035)
+        self.assertEqual(self.server.queries[-1],
+                         '-k -g REGRESSION:3:1983035-LAST')
+        self.assertEqual(self.delays, [nrtm.NRTM_RETRY[0]])
+        self.assertTrue(conn.persistent)
+
+    def test_03__error_backs_off_longer(self):
+        conn = self.connection(send('%ERROR:402: not authorized\n'),
+                               send(nrtm_data_1))
+        serials = self.take(conn.updates(1983029), 6)
+        self.assertEqual(serials[0], 1983029)
+        self.assertEqual(self.delays, [nrtm.NRTM_ERROR_RETRY[0]])
+
+    def test_04__connect_failures_back_off(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        def sleep(delay):
+            self.delays.append(delay)
+            if len(self.delays) == 3:
+                raise Stop()
+        conn = nrtm.NRTMConnection('127.0.0.1', port, 'REGRESSION',
+                                   error_retry=(2, 5), sleep=sleep)
+        self.assertRaises(Stop, next, conn.updates(1))
+        self.assertEqual(self.delays, [2, 4, 5])
+
+    def test_05__skip_seen_updates(self):
+        conn = self.connection(send(nrtm_data_1), send(nrtm_data_2))
+        serials = self.take(conn.updates(1983032), 4)
+        self.assertEqual(serials, [1983032, 1983033, 1983034, 1983035])
+
+    def test_06__resume_from_snapshot_serial(self):
+        self.server = StubServer(send(nrtm_data_1))
+        client = nrtm.client(serialoverride=1983028, dump=None,
+                             nrtmhost='127.0.0.1', nrtmport=self.server.port,
+                             dbname='REGRESSION')
+        updates = client.get()
+        self.assertEqual(next(updates)[1], 1983029)
+        self.assertEqual(self.server.queries,
+                         ['-k -g REGRESSION:3:1983029-LAST'])
+        self.assertEqual(client.serial, 1983029)
+
+    def test_07__caught_up_is_not_an_error(self):
+        conn = self.connection(
+            send('%ERROR:401: invalid range: Not within 1-1983028\n'),
+            send(nrtm_data_1))
+        serials = self.take(conn.updates(1983029), 6)
+        self.assertEqual(serials[0], 1983029)
+        self.assertEqual(self.delays, [nrtm.NRTM_RETRY[0]])
+
+        self.assertFalse(nrtm.past_last_serial(
+            '%ERROR:401: invalid range: Not within 1983030-1983040', 1983029))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import radix
+
+from irrexplorer import prefixindex, rwlock
+
+
+ROUTES = [
+    ('10.0.0.0/8', [1]),
+    ('10.0.0.0/16', [2, 3]),
+    ('10.1.0.0/16', [4]),
+    ('10.1.2.0/24', [4]),
+    ('11.0.0.0/8', [5]),
+    ('2001:db8::/32', [6]),
+    ('2001:db8:1::/48', [7]),
+    ('2001:db9::/32', [8]),
+]
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'test.idx')
+        self.tree = radix.Radix()
+        for prefix, origins in ROUTES:
+            self.tree.add(prefix).data['origins'] = origins
+        prefixindex.write_index(self.path,
+                                prefixindex.tree_entries(self.tree))
+        self.index = prefixindex.PrefixIndex(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_00__missing_index(self):
+        index = prefixindex.PrefixIndex(os.path.join(self.tmpdir, 'no.idx'))
+        self.assertFalse(index.available)
+
+    def test_01__search_exact(self):
+        self.assertEqual(self.index.search_exact('10.0.0.0/16'),
+                         {'10.0.0.0/16': {'origins': [2, 3]}})
+        self.assertEqual(self.index.search_exact('10.0.0.0/24'), {})
+        self.assertEqual(self.index.search_exact('2001:db8::/32'),
+                         {'2001:db8::/32': {'origins': [6]}})
+
+    def test_02__search_specifics_matches_radix(self):
+        for target in ['10.0.0.0/8', '10.1.0.0/16', '0.0.0.0/0',
+                       '12.0.0.0/8', '2001:db8::/31', '::/0']:
+            expected = dict((rnode.prefix, {'origins': rnode.data['origins']})
+                            for rnode in self.tree.search_covered(target))
+            self.assertEqual(self.index.search_specifics(target), expected)
+
+    def test_03__search_aggregate_matches_radix(self):
+        for target in ['10.1.2.0/24', '11.2.0.0/16', '12.0.0.0/8',
+                       '2001:db8:1::/64']:
+            rnode = self.tree.search_worst(target)
+            expected = None
+            if rnode:
+                expected = (rnode.prefix, {'origins': rnode.data['origins']})
+            self.assertEqual(self.index.search_aggregate(target), expected)
+
+    def test_04__single_origin_and_republish(self):
+        prefixindex.write_index(self.path, [('192.0.2.0/24', [65000])],
+                                single_origin=True)
+        os.utime(self.path, (0, 0))
+        self.assertEqual(self.index.search_exact('192.0.2.0/24'),
+                         {'192.0.2.0/24': {'origins': 65000}})
+        self.assertEqual(self.index.search_exact('10.0.0.0/8'), {})
+
+    def test_05__remove_stale_index(self):
+        prefixindex.remove_index(self.path)
+        self.assertFalse(os.path.exists(self.path))
+        prefixindex.remove_index(self.path)
+        index = prefixindex.PrefixIndex(self.path)
+        self.assertFalse(index.available)
+
+    def test_06__publish_once_ready(self):
+        prefixindex.remove_index(self.path)
+        ready = threading.Event()
+        publisher = prefixindex.IndexPublisher(self.tree, self.path,
+                                               interval=0.01,
+                                               ready_event=ready)
+        publisher.setDaemon(True)
+        publisher.start()
+        time.sleep(0.05)
+        self.assertFalse(os.path.exists(self.path))
+        ready.set()
+        for i in range(100):
+            if os.path.exists(self.path):
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.index.search_exact('11.0.0.0/8'),
+                         {'11.0.0.0/8': {'origins': [5]}})
+
+    def test_07__interval_follows_publish_time(self):
+        publisher = prefixindex.IndexPublisher(self.tree, self.path,
+                                               interval=10)
+        self.assertEqual(publisher.next_delay(), 10)
+        publisher.publish_time = 3
+        self.assertEqual(publisher.next_delay(),
+                         3 * prefixindex.PUBLISH_COST_FACTOR)
+
+    def test_08__publish_under_read_lock(self):
+        lock = rwlock.ReadWriteLock()
+        publisher = prefixindex.IndexPublisher(self.tree, self.path,
+                                               lock=lock)
+        t = threading.Thread(target=publisher.publish)
+        with lock.writing():
+            self.tree.add('12.0.0.0/8').data['origins'] = [9]
+            t.start()
+            time.sleep(0.05)
+            self.assertTrue(t.is_alive())
+        t.join()
+        self.assertEqual(self.index.search_exact('12.0.0.0/8'),
+                         {'12.0.0.0/8': {'origins': [9]}})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -29,7 +29,9 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 
 import unittest
 
+from irrexplorer import advice
 from irrexplorer import parser
+from irrexplorer import utils
 
 
 class TestIRRExplorer(unittest.TestCase):
@@ -37,6 +39,79 @@ class TestIRRExplorer(unittest.TestCase):
         dump = open('tests/irrtest.data')
         self.assertTrue(list(parser.parse_dump(dump)))
 
+    def test_01__parse_objects(self):
+        dump = [
+            "mntner:     MAINT-AS65000\n",
+            "descr:      skipped\n",
+            "\n",
+            "route:      192.0.2.0/24 # comment\n",
+            "origin:     AS1.10\n",
+            "source:     TEST\n",
+            "\n",
+            "as-set:     AS-TEST\n",
+            "members:    AS65000, AS-OTHER # comment\n",
+            "            AS65001,\n",
+            "descr:      AS65002\n",
+            "source:     TEST\n",
+        ]
+        self.assertEqual(list(parser.parse_dump(dump)), [
+            {'kind': 'route', 'name': '192.0.2.0/24', 'origin': 65546,
+             'source': 'TEST'},
+            {'kind': 'as-set', 'name': 'AS-TEST', 'source': 'TEST',
+             'members': set(['AS65000', 'AS-OTHER', 'AS65001'])},
+        ])
+        self.assertEqual(parser.parse_object(dump[:2]), None)
+
+    def test_02__parse_dump_parallel(self):
+        serial = list(parser.parse_dump(open('tests/irrtest.data')))
+        parallel = list(parser.parse_dump_parallel(
+            open('tests/irrtest.data'), processes=2, chunk_lines=5))
+        self.assertEqual(parallel, serial)
+
+
+
+class TestBulkReport(unittest.TestCase):
+    def test_00__not_found_rows_and_found_aggregate(self):
+        reports = {
+            '10.0.0.0/8': {
+                '10.0.0.0/8': {'bgp_origin': 65000, 'ripe_managed': False,
+                               'radb': [65000], 'advice': 'Looks good',
+                               'label': 'success'},
+            },
+        }
+        found = []
+        reported = []
+
+        def find_aggregate(prefix, missing):
+            found.append(prefix)
+            missing.append('ripe')
+            return '10.0.0.0/8'
+
+        def prefix_report(aggregate, missing):
+            # the aggregate is passed on, not looked up again
+            reported.append((aggregate, list(missing)))
+            return reports[aggregate], missing
+
+        def not_found_row(prefix, report):
+            return advice.not_found_row(report, False)
+
+        results = list(utils.bulk_report(
+            ['10.1.0.0/16', '10.0.0.0/8', '10.0.0.1/8'], find_aggregate,
+            prefix_report, not_found_row))
+        self.assertEqual(found, ['10.0.0.0/8'])
+        self.assertEqual(reported, [('10.0.0.0/8', ['ripe'])])
+        self.assertEqual([r['prefix'] for r in results],
+                         ['10.0.0.0/8', '10.0.0.1/8', '10.1.0.0/16'])
+        self.assertEqual(results[0]['report'],
+                         reports['10.0.0.0/8']['10.0.0.0/8'])
+        # written differently, the same prefix
+        self.assertEqual(results[1]['report'], results[0]['report'])
+        self.assertEqual(results[2], {
+            'prefix': '10.1.0.0/16', 'aggregate': '10.0.0.0/8',
+            'missing': ['ripe'],
+            'report': {'bgp_origin': False, 'ripe_managed': False,
+                       'radb': '-', 'advice': advice.NOT_FOUND[0],
+                       'label': advice.NOT_FOUND[1]}})
 
 def main():
     unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import time
+import unittest
+
+from irrexplorer import rwlock
+
+
+class TestReadWriteLock(unittest.TestCase):
+    def setUp(self):
+        self.lock = rwlock.ReadWriteLock()
+        self.events = []
+
+    def test_00__readers_share(self):
+        with self.lock.reading():
+            reader = threading.Thread(target=self.read)
+            reader.start()
+            reader.join(1)
+            self.assertFalse(reader.isAlive())
+        self.assertEqual(self.events, ['read'])
+
+    def test_01__writer_excludes_readers(self):
+        with self.lock.writing():
+            reader = threading.Thread(target=self.read)
+            reader.start()
+            time.sleep(0.05)
+            self.events.append('written')
+        reader.join(1)
+        self.assertEqual(self.events, ['written', 'read'])
+
+    def test_02__waiting_reader_goes_before_next_write(self):
+        with self.lock.writing():
+            reader = threading.Thread(target=self.read, args=(0.05,))
+            reader.start()
+            time.sleep(0.05)
+        # the reader is waiting, the next update has to wait for it
+        with self.lock.writing():
+            self.events.append('written')
+        reader.join(1)
+        self.assertEqual(self.events, ['read', 'written'])
+
+    def read(self, hold=0):
+        with self.lock.reading():
+            time.sleep(hold)
+            self.events.append('read')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
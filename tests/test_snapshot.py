@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import radix
+
+from irrexplorer import rwlock, snapshot
+
+
+class Worker(object):
+    """ the parts of a NRTMWorker a SnapshotWriter uses """
+    def __init__(self):
+        self.dump = None
+        self.feed = self
+        self.dbname = 'REGRESSION'
+        self.serial = 1
+        self.tree = radix.Radix()
+        self.asn_prefix_map = {}
+        self.assets = {}
+        self.lock = rwlock.ReadWriteLock()
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'regression.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_00__roundtrip(self):
+        tree = radix.Radix()
+        tree.add('192.0.2.0/24').data['origins'] = [65000, 65001]
+        tree.add('2001:db8::/32').data['origins'] = [65002]
+        asn_prefix_map = {65000: set(['192.0.2.0/24']),
+                          65001: set(['192.0.2.0/24']),
+                          65002: set(['2001:db8::/32'])}
+        assets = {'AS-TEST': set(['AS65000', 'AS-OTHER'])}
+        state = snapshot.capture('REGRESSION', 1983034, tree,
+                                 asn_prefix_map, assets)
+        snapshot.write_snapshot(self.path, state)
+
+        state = snapshot.load_snapshot(self.path, 'REGRESSION')
+        self.assertEqual(state['serial'], 1983034)
+        new_tree, new_asn_prefix_map, new_assets = radix.Radix(), {}, {}
+        snapshot.restore(state, new_tree, new_asn_prefix_map, new_assets)
+        self.assertEqual(new_tree.search_exact('192.0.2.0/24').data,
+                         {'origins': [65000, 65001]})
+        self.assertEqual(len(new_tree.nodes()), 2)
+        self.assertEqual(new_asn_prefix_map, asn_prefix_map)
+        self.assertEqual(new_assets, assets)
+
+    def test_01__unusable_snapshots(self):
+        self.assertEqual(snapshot.load_snapshot(self.path, 'REGRESSION'),
+                         None)
+        state = snapshot.capture('REGRESSION', 1, radix.Radix(), {}, {})
+        snapshot.write_snapshot(self.path, state)
+        self.assertEqual(snapshot.load_snapshot(self.path, 'OTHER'), None)
+        self.assertEqual(snapshot.load_snapshot(self.path, 'REGRESSION',
+                                                max_age=-1), None)
+
+    def test_02__touch_unchanged_snapshot(self):
+        writer = snapshot.SnapshotWriter(Worker(), self.path)
+        writer.snapshot()
+        old = time.time() - 7200
+        os.utime(self.path, (old, old))
+        self.assertEqual(snapshot.load_snapshot(self.path, 'REGRESSION',
+                                                max_age=3600), None)
+        writer.snapshot()
+        self.assertEqual(snapshot.load_snapshot(self.path, 'REGRESSION',
+                                                max_age=3600)['serial'], 1)
+
+    def test_03__restore_normalizes_inverse_map(self):
+        state = snapshot.capture('REGRESSION', 1, radix.Radix(),
+                                 {15169: set(['2001:4860:0000::/32'])}, {})
+        asn_prefix_map = {}
+        snapshot.restore(state, radix.Radix(), asn_prefix_map, {})
+        self.assertEqual(asn_prefix_map, {15169: set(['2001:4860::/32'])})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import multiprocessing
+import unittest
+
+from irrexplorer import status
+
+
+def load(load_status):
+    for _ in range(3):
+        load_status.applied()
+    load_status.set_serial(1234)
+    load_status.set_ready()
+
+
+class TestLoadStatus(unittest.TestCase):
+    def test_00__shared_with_worker(self):
+        load_status = status.LoadStatus('RADB')
+        self.assertEqual(load_status.to_dict(), {
+            'state': status.LOADING, 'objects': 0, 'serial': None})
+        worker = multiprocessing.Process(target=load, args=(load_status,))
+        worker.start()
+        worker.join()
+        self.assertTrue(load_status.is_ready())
+        self.assertEqual(load_status.to_dict(), {
+            'state': status.READY, 'objects': 3, 'serial': 1234})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
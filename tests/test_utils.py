@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# Copyright (C) 2015 Job Snijders <job@instituut.net>
+#
+# This file is part of IRR Explorer
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright notice,
+# this list of conditions and the following disclaimer.
+#
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+import random
+
+import ipaddr
+import radix
+
+from irrexplorer import utils
+
+
+class TestParseAutnum(unittest.TestCase):
+    def test_00__parse_autnum(self):
+        self.assertEqual(utils.parse_autnum('AS65000'), 65000)
+        self.assertEqual(utils.parse_autnum('as65000'), 65000)
+        self.assertEqual(utils.parse_autnum('65000'), 65000)
+        for autnum in ['AS', 'AS-FOO', 'AS65000.1', '', 'ASN1']:
+            self.assertRaises(ValueError, utils.parse_autnum, autnum)
+
+
+class TestGroupByAggregate(unittest.TestCase):
+    def test_00__group_by_aggregate(self):
+        tree = radix.Radix()
+        for prefix in ['10.0.0.0/8', '192.0.2.0/24', '2001:db8::/32']:
+            tree.add(prefix)
+        calls = []
+
+        def find_aggregate(prefix):
+            calls.append(prefix)
+            rnode = tree.search_worst(prefix)
+            if not rnode:
+                raise LookupError('no aggregate for %s' % prefix)
+            return rnode.prefix
+
+        groups, failed = utils.group_by_aggregate(
+            ['10.1.2.0/24', '10.1.0.0/16', '192.0.2.0/25', '10.0.0.0/8',
+             '2001:db8:1::/48', '198.51.100.0/24', 'garbage'],
+            find_aggregate)
+        self.assertEqual(dict(groups), {
+            '10.0.0.0/8': ['10.0.0.0/8', '10.1.0.0/16', '10.1.2.0/24'],
+            '192.0.2.0/24': ['192.0.2.0/25'],
+            '2001:db8::/32': ['2001:db8:1::/48'],
+        })
+        self.assertEqual([prefix for prefix, _ in failed],
+                         ['garbage', '198.51.100.0/24'])
+        self.assertEqual(len(calls), 4)
+
+
+class TestPrefixRanges(unittest.TestCase):
+    def test_00__more_specifics(self):
+        prefixes = ['10.0.0.0/8', '2001:db8::/32', '10.1.0.0/16', '',
+                    '10.0.0.0/24', '11.0.0.0/8', '9.255.255.0/24',
+                    '2001:db8:1::/48', '2001:db9::/32', '10.255.255.255/32']
+        ranges = utils.PrefixRanges(prefixes)
+        self.assertEqual(ranges.more_specifics('10.0.0.0/8'),
+                         ['10.0.0.0/8', '10.1.0.0/16', '10.0.0.0/24',
+                          '10.255.255.255/32'])
+        self.assertEqual(ranges.more_specifics('10.0.0.0/16'),
+                         ['10.0.0.0/24'])
+        self.assertEqual(ranges.more_specifics('2001:db8::/31'),
+                         ['2001:db8::/32', '2001:db8:1::/48',
+                          '2001:db9::/32'])
+        self.assertEqual(ranges.more_specifics('0.0.0.0/0'),
+                         ['10.0.0.0/8', '10.1.0.0/16', '10.0.0.0/24',
+                          '11.0.0.0/8', '9.255.255.0/24',
+                          '10.255.255.255/32'])
+        self.assertEqual(ranges.more_specifics('192.0.2.0/24'), [])
+
+    def test_01__same_as_ipaddr(self):
+        rnd = random.Random(42)
+        prefixes = ['%i.%i.0.0/%i' % (rnd.randint(8, 11), rnd.randint(0, 255),
+                                      rnd.randint(8, 24)) for _ in range(500)]
+        prefixes = [str(ipaddr.IPNetwork(p).masked()) for p in prefixes]
+        ranges = utils.PrefixRanges(prefixes)
+        for target in ['8.0.0.0/7', '10.0.0.0/8', '10.128.0.0/9',
+                       '11.7.0.0/16']:
+            expected = [p for p in prefixes
+                        if ipaddr.IPNetwork(p) in ipaddr.IPNetwork(target)]
+            self.assertEqual(ranges.more_specifics(target), expected)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()